@@ -6,9 +6,12 @@ try:
 except ImportError:
     __version__ = ''
 
-from ._sqldb import SQLDatabase, SQLTable, SQLRow, SQLColumn
+from ._sqldb import (SQLDatabase, SQLTable, SQLRow, SQLColumn, SQLAppender,
+                     SQLWriter)
+from ._async import AsyncSQLDatabase, AsyncSQLTable
 from ._def import _ID_KEY
-from .where import Where
+from .where import Where, WhereExpression
 
-__all__ = ['SQLDatabase', 'SQLTable', 'SQLRow', 'SQLColumn',
-           'Where', '__version__', '_ID_KEY']
+__all__ = ['SQLDatabase', 'SQLTable', 'SQLRow', 'SQLColumn', 'SQLAppender',
+           'SQLWriter', 'AsyncSQLDatabase', 'AsyncSQLTable', 'Where',
+           'WhereExpression', '__version__', '_ID_KEY']
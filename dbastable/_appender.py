@@ -0,0 +1,193 @@
+"""Buffered appender to add rows to a table in batches."""
+import time
+
+
+class SQLAppender:
+    """Buffer rows in memory and add them to a table in batches.
+
+    Each flush sanitizes all the buffered rows and inserts them with a single
+    command, so the per-row overhead of `~dbastable.SQLDatabase.add_rows` is
+    paid only once per batch.
+
+    Parameters
+    ----------
+    db : SQLDatabase
+        The parent database object.
+    table : str
+        The name of the table in the database.
+    batch_size : int (optional)
+        Number of buffered rows that triggers a flush. Defaults to 1000.
+    flush_interval : float (optional)
+        Maximum time, in seconds, that rows stay in the buffer. It is checked
+        when new rows are appended. If None, only the ``batch_size`` triggers
+        a flush.
+    add_columns : bool (optional)
+        If True, add missing columns to the table when flushing.
+
+    Notes
+    -----
+    - Rows still in the buffer are only written by `flush` or `close`. Use
+      the appender as a context manager to ensure all rows are written.
+    - List rows must have the values in the same order as the column names
+      of the table at the moment of the flush.
+    """
+
+    def __init__(self, db, table, batch_size=1000, flush_interval=None,
+                 add_columns=False):
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer.')
+        self._db = db
+        self._table = table
+        self.batch_size = int(batch_size)
+        self.flush_interval = flush_interval
+        self.add_columns = add_columns
+
+        self._rows = []
+        self._first_time = None
+        self._closed = False
+
+        self._n_rows = 0
+        self._n_flushes = 0
+        self._flush_time = 0.0
+
+    @property
+    def table(self):
+        """Get the table name."""
+        return self._table
+
+    @property
+    def pending(self):
+        """Get the number of rows waiting in the buffer."""
+        return len(self._rows)
+
+    @property
+    def stats(self):
+        """Get the statistics of the appender.
+
+        Returns
+        -------
+        res : dict
+            Dictionary with the number of ``rows`` written, the number of
+            ``flushes``, the ``pending`` rows, the total ``flush_time`` in
+            seconds and the write throughput in ``rows_per_second``.
+        """
+        rate = self._n_rows/self._flush_time if self._flush_time else 0.0
+        return {'rows': self._n_rows,
+                'flushes': self._n_flushes,
+                'pending': self.pending,
+                'flush_time': self._flush_time,
+                'rows_per_second': rate}
+
+    def append(self, row):
+        """Append a single row to the buffer.
+
+        Parameters
+        ----------
+        row : dict, list or tuple
+            Row to add. If dict, keys are column names. If list or tuple, the
+            values are in the same order as the column names.
+        """
+        if self._closed:
+            raise ValueError('appender is closed.')
+        if not isinstance(row, (dict, list, tuple)):
+            raise TypeError('row must be a dict, list or tuple. '
+                            f'Not {type(row)}.')
+        if self._first_time is None:
+            self._first_time = time.monotonic()
+        self._rows.append(row)
+
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+        elif self.flush_interval is not None and \
+                time.monotonic() - self._first_time >= self.flush_interval:
+            self.flush()
+
+    def extend(self, rows):
+        """Append several rows to the buffer. See `append`.
+
+        Parameters
+        ----------
+        rows : list
+            List of rows to add.
+        """
+        for row in rows:
+            self.append(row)
+
+    def _to_values(self, rows):
+        """Convert the buffered rows to sanitized tuples of values."""
+        db = self._db
+        table = self._table
+
+        # keys of all dict rows, keeping the order they appear
+        keys = {}
+        for row in rows:
+            if isinstance(row, dict):
+                keys.update(dict.fromkeys(row.keys()))
+
+        existing = db.column_names(table)
+        n_before = len(existing)
+        missing = [k for k in keys if k.lower() not in existing]
+        if len(missing) > 0:
+            if not self.add_columns:
+                raise KeyError(f'Columns {missing} do not exist in the '
+                               'table.')
+            for k in missing:
+                db.add_column(table, k)
+
+        columns = db.column_names(table, do_not_decode=True)
+        index = {c: i for i, c in enumerate(columns)}
+        # key sanitization is done once per key, not once per row
+        position = {k: index[db._sanitize_colnames(k)] for k in keys}
+
+        n = len(columns)
+        sanitize = db._sanitize_value
+        values = []
+        for row in rows:
+            if isinstance(row, dict):
+                v = [None]*n
+                for k, i in row.items():
+                    v[position[k]] = sanitize(i)
+            else:
+                if len(row) not in (n, n_before):
+                    raise ValueError('row must have the same number of '
+                                     'columns as the table.')
+                # pad rows created before the new columns were added
+                v = [sanitize(i) for i in row] + [None]*(n - len(row))
+            values.append(tuple(v))
+        return columns, values
+
+    def flush(self):
+        """Write all the buffered rows to the table in a single command."""
+        if len(self._rows) == 0:
+            return
+        t0 = time.perf_counter()
+        columns, values = self._to_values(self._rows)
+        if len(columns) > 0:
+            self._db._insert_rows(self._table, columns, values)
+        self._flush_time += time.perf_counter() - t0
+        self._n_rows += len(values)
+        self._n_flushes += 1
+        self._rows = []
+        self._first_time = None
+
+    def close(self):
+        """Flush the remaining rows and close the appender."""
+        if not self._closed:
+            self.flush()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """Get the number of rows waiting in the buffer."""
+        return self.pending
+
+    def __repr__(self):
+        """Get a string representation of the appender."""
+        s = f"{self.__class__.__name__} for table '{self._table}' "
+        s += f"({self.pending} pending rows, {self._n_rows} written)"
+        return s
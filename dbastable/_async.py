@@ -0,0 +1,356 @@
+"""Asyncio front-end to use the databases without blocking the event loop."""
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from ._sqldb import SQLDatabase
+
+
+__all__ = ['AsyncSQLDatabase', 'AsyncSQLTable']
+
+
+class AsyncSQLDatabase:
+    """Asyncio version of `~dbastable.SQLDatabase`.
+
+    All the commands are executed in dedicated worker threads, so the event
+    loop is never blocked. The methods have the same arguments of the
+    `~dbastable.SQLDatabase` methods, but must be awaited.
+
+    Parameters
+    ----------
+    db : str
+        The name of the database file. If ':memory:' or None is given, the
+        database will be created in memory.
+    max_workers : int (optional)
+        Number of worker threads. With more than one worker, the database is
+        opened in ``thread_safe`` mode, so it must be stored in a file.
+        Defaults to 1.
+        With more than one worker, an extra thread runs the iterations of
+        `iter_select`.
+    **kwargs
+        Keyword arguments to pass to `~dbastable.SQLDatabase`.
+    """
+
+    def __init__(self, db=None, max_workers=1, **kwargs):
+        if max_workers > 1:
+            kwargs['thread_safe'] = True
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='dbastable-async'
+        )
+        # each iteration must run in a single thread, as its cursor and
+        # temporary tables belong to the connection of that thread
+        if max_workers > 1:
+            self._iter_executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix='dbastable-async-iter'
+            )
+        else:
+            self._iter_executor = self._executor
+        self._iterators = weakref.WeakSet()
+        # the database is created in the worker, that owns the connection
+        try:
+            self._sync = self._executor.submit(SQLDatabase, db,
+                                               **kwargs).result()
+        except BaseException:
+            self._shutdown()
+            raise
+
+    @property
+    def db(self):
+        """Get the database name."""
+        return self._sync.db
+
+    @property
+    def sync(self):
+        """Get the underlying `~dbastable.SQLDatabase`.
+
+        Its methods must not be called from the event loop thread.
+        """
+        return self._sync
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a function in the worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,
+                                          functools.partial(func, *args,
+                                                            **kwargs))
+
+    async def _run_iter(self, func, *args):
+        """Run a function in the thread of the iterations."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._iter_executor, func, *args)
+
+    def _shutdown(self):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False)
+        if self._iter_executor is not self._executor:
+            self._iter_executor.shutdown(wait=False)
+
+    async def execute(self, command, arguments=None):
+        """Awaitable `~dbastable.SQLDatabase.execute`."""
+        return await self._run(self._sync.execute, command, arguments)
+
+    async def executemany(self, command, arguments):
+        """Awaitable `~dbastable.SQLDatabase.executemany`."""
+        return await self._run(self._sync.executemany, command, arguments)
+
+    async def commit(self):
+        """Awaitable `~dbastable.SQLDatabase.commit`."""
+        return await self._run(self._sync.commit)
+
+    async def table_names(self):
+        """Awaitable `~dbastable.SQLDatabase.table_names`."""
+        return await self._run(lambda: self._sync.table_names)
+
+    async def column_names(self, table, do_not_decode=False):
+        """Awaitable `~dbastable.SQLDatabase.column_names`."""
+        return await self._run(self._sync.column_names, table,
+                               do_not_decode=do_not_decode)
+
+    async def column_types(self, table):
+        """Awaitable `~dbastable.SQLDatabase.column_types`."""
+        return await self._run(self._sync.column_types, table)
+
+    async def add_table(self, table, columns=None, data=None):
+        """Awaitable `~dbastable.SQLDatabase.add_table`."""
+        return await self._run(self._sync.add_table, table, columns=columns,
+                               data=data)
+
+    async def drop_table(self, table):
+        """Awaitable `~dbastable.SQLDatabase.drop_table`."""
+        return await self._run(self._sync.drop_table, table)
+
+    async def add_column(self, table, column, data=None):
+        """Awaitable `~dbastable.SQLDatabase.add_column`."""
+        return await self._run(self._sync.add_column, table, column,
+                               data=data)
+
+    async def delete_column(self, table, column):
+        """Awaitable `~dbastable.SQLDatabase.delete_column`."""
+        return await self._run(self._sync.delete_column, table, column)
+
+    async def set_column(self, table, column, data):
+        """Awaitable `~dbastable.SQLDatabase.set_column`."""
+        return await self._run(self._sync.set_column, table, column, data)
+
+    async def set_columns(self, table, data):
+        """Awaitable `~dbastable.SQLDatabase.set_columns`."""
+        return await self._run(self._sync.set_columns, table, data)
+
+    async def add_rows(self, table, data, add_columns=False,
+                       skip_sanitize=False):
+        """Awaitable `~dbastable.SQLDatabase.add_rows`."""
+        return await self._run(self._sync.add_rows, table, data,
+                               add_columns=add_columns,
+                               skip_sanitize=skip_sanitize)
+
+    async def delete_row(self, table, index):
+        """Awaitable `~dbastable.SQLDatabase.delete_row`."""
+        return await self._run(self._sync.delete_row, table, index)
+
+    async def set_row(self, table, row, data):
+        """Awaitable `~dbastable.SQLDatabase.set_row`."""
+        return await self._run(self._sync.set_row, table, row, data)
+
+    async def set_rows(self, table, indexes, data):
+        """Awaitable `~dbastable.SQLDatabase.set_rows`."""
+        return await self._run(self._sync.set_rows, table, indexes, data)
+
+    async def get_item(self, table, column, row):
+        """Awaitable `~dbastable.SQLDatabase.get_item`."""
+        return await self._run(self._sync.get_item, table, column, row)
+
+    async def set_item(self, table, column, row, value):
+        """Awaitable `~dbastable.SQLDatabase.set_item`."""
+        return await self._run(self._sync.set_item, table, column, row,
+                               value)
+
+    async def set_items(self, table, column, indexes, values):
+        """Awaitable `~dbastable.SQLDatabase.set_items`."""
+        return await self._run(self._sync.set_items, table, column, indexes,
+                               values)
+
+    async def count(self, table, where=None):
+        """Awaitable `~dbastable.SQLDatabase.count`."""
+        return await self._run(self._sync.count, table, where=where)
+
+    async def select(self, table, columns=None, where=None, order=None,
+                     limit=None, offset=None):
+        """Awaitable `~dbastable.SQLDatabase.select`."""
+        return await self._run(self._sync.select, table, columns=columns,
+                               where=where, order=order, limit=limit,
+                               offset=offset)
+
+    async def iter_select(self, table, columns=None, where=None, order=None,
+                          limit=None, offset=None, chunk_size=1000):
+        """Asynchronous iterator over chunks of selected rows.
+
+        Use it with ``async for``. All the chunks are fetched in the same
+        worker thread. See `~dbastable.SQLDatabase.iter_select`.
+
+        Leaving the loop early does not finish the iteration at once. Wrap
+        the iterator in `contextlib.aclosing` (Python 3.10 or newer), or
+        call its ``aclose`` method, to release its cursor and temporary
+        tables right after the loop. Pending iterations are finished when
+        the database is closed.
+        """
+        gen = self._sync.iter_select(table, columns=columns, where=where,
+                                     order=order, limit=limit, offset=offset,
+                                     chunk_size=chunk_size)
+        self._iterators.add(gen)
+        try:
+            while True:
+                rows = await self._run_iter(next, gen, None)
+                if rows is None:
+                    break
+                yield rows
+        finally:
+            # the iteration may already be finished by close
+            if gen.gi_frame is not None:
+                await self._run_iter(gen.close)
+
+    async def update(self, table, values, where=None):
+        """Awaitable `~dbastable.SQLDatabase.update`."""
+        return await self._run(self._sync.update, table, values, where=where)
+
+    async def index_of(self, table, where):
+        """Awaitable `~dbastable.SQLDatabase.index_of`."""
+        return await self._run(self._sync.index_of, table, where)
+
+    async def index_of_many(self, table, column, values, duplicates='first'):
+        """Awaitable `~dbastable.SQLDatabase.index_of_many`."""
+        return await self._run(self._sync.index_of_many, table, column,
+                               values, duplicates=duplicates)
+
+    async def get_table(self, table):
+        """Get an `AsyncSQLTable` viewer, checking if the table exists."""
+        await self._run(self._sync._check_table, table)
+        return AsyncSQLTable(self, table)
+
+    async def close(self):
+        """Close the database and stop the worker threads."""
+        # pending iterations must end before their connections are closed
+        for gen in list(self._iterators):
+            await self._run_iter(gen.close)
+        await self._run(self._sync.close)
+        self._shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __getitem__(self, table):
+        """Get an `AsyncSQLTable` viewer. The table is not checked."""
+        if not isinstance(table, str):
+            raise KeyError('item must be a table name.')
+        return AsyncSQLTable(self, table)
+
+    def __repr__(self):
+        """Get a string representation of the database."""
+        return f"{self.__class__.__name__} '{self.db}' at {hex(id(self))}"
+
+
+class AsyncSQLTable:
+    """Asyncio version of `~dbastable.SQLTable`.
+
+    The methods have the same arguments of the `~dbastable.SQLTable` methods,
+    but must be awaited.
+
+    Parameters
+    ----------
+    db : AsyncSQLDatabase
+        The parent database object.
+    name : str
+        The name of the table in the database.
+    """
+
+    def __init__(self, db, name):
+        self._db = db
+        self._name = name
+
+    @property
+    def name(self):
+        """Get the name of the table."""
+        return self._name
+
+    async def column_names(self):
+        """Awaitable `~dbastable.SQLTable.column_names`."""
+        return await self._db.column_names(self._name)
+
+    async def values(self):
+        """Awaitable `~dbastable.SQLTable.values`."""
+        return await self._db.select(self._name)
+
+    async def count(self, where=None):
+        """Get the number of rows in the table, like ``len(table)``."""
+        return await self._db.count(self._name, where=where)
+
+    async def select(self, **kwargs):
+        """Awaitable `~dbastable.SQLTable.select`."""
+        return await self._db.select(self._name, **kwargs)
+
+    async def iter_select(self, **kwargs):
+        """Asynchronous iterator over chunks of selected rows.
+        See `AsyncSQLDatabase.iter_select`.
+        """
+        async for rows in self._db.iter_select(self._name, **kwargs):
+            yield rows
+
+    async def add_column(self, name, data=None):
+        """Awaitable `~dbastable.SQLTable.add_column`."""
+        return await self._db.add_column(self._name, name, data=data)
+
+    async def add_rows(self, data, add_columns=False):
+        """Awaitable `~dbastable.SQLTable.add_rows`."""
+        return await self._db.add_rows(self._name, data,
+                                       add_columns=add_columns)
+
+    async def set_column(self, column, data):
+        """Awaitable `~dbastable.SQLTable.set_column`."""
+        return await self._db.set_column(self._name, column, data)
+
+    async def set_columns(self, data):
+        """Awaitable `~dbastable.SQLTable.set_columns`."""
+        return await self._db.set_columns(self._name, data)
+
+    async def set_row(self, row, data):
+        """Awaitable `~dbastable.SQLTable.set_row`."""
+        return await self._db.set_row(self._name, row, data)
+
+    async def set_rows(self, indexes, data):
+        """Awaitable `~dbastable.SQLTable.set_rows`."""
+        return await self._db.set_rows(self._name, indexes, data)
+
+    async def set_items(self, column, indexes, values):
+        """Awaitable `~dbastable.SQLTable.set_items`."""
+        return await self._db.set_items(self._name, column, indexes, values)
+
+    async def update(self, values, where=None):
+        """Awaitable `~dbastable.SQLTable.update`."""
+        return await self._db.update(self._name, values, where=where)
+
+    async def delete_column(self, column):
+        """Awaitable `~dbastable.SQLTable.delete_column`."""
+        return await self._db.delete_column(self._name, column)
+
+    async def delete_row(self, row):
+        """Awaitable `~dbastable.SQLTable.delete_row`."""
+        return await self._db.delete_row(self._name, row)
+
+    async def index_of(self, where):
+        """Awaitable `~dbastable.SQLTable.index_of`."""
+        return await self._db.index_of(self._name, where)
+
+    async def index_of_many(self, column, values, duplicates='first'):
+        """Awaitable `~dbastable.SQLTable.index_of_many`."""
+        return await self._db.index_of_many(self._name, column, values,
+                                            duplicates=duplicates)
+
+    def __repr__(self):
+        """Get a string representation of the table."""
+        return f"{self.__class__.__name__} '{self._name}' in database " \
+               f"'{self._db.db}'"
@@ -0,0 +1,53 @@
+"""Helpers to work with the databases in parallel processes."""
+import sqlite3 as sql
+import pathlib
+
+from ._def import _ID_KEY
+
+
+def _readonly_uri(path, immutable=False):
+    """Get the URI to open a database file in read-only mode."""
+    uri = pathlib.Path(path).absolute().as_uri() + '?mode=ro'
+    if immutable:
+        uri += '&immutable=1'
+    return uri
+
+
+def _map_range(path, table, columns, start, stop, func):
+    """Apply a function to the rows with ``start <= __id__ < stop``.
+
+    This runs in the worker processes, each one with its own read-only
+    connection. Rows are streamed from the cursor, not fetched at once.
+    """
+    con = sql.connect(_readonly_uri(path), uri=True)
+    try:
+        comm = f"SELECT {columns} FROM {table} "
+        comm += f"WHERE {_ID_KEY} >= ? AND {_ID_KEY} < ? "
+        comm += f"ORDER BY {_ID_KEY};"
+        return [func(row) for row in con.execute(comm, (start, stop))]
+    finally:
+        con.close()
+
+
+def _ingest_shard(db_class, path, table, columns, sources, func, add_columns,
+                  allow_b32_colnames):
+    """Write the data read from a group of sources to a shard database.
+
+    This runs in the worker processes. The shard table starts with the
+    columns of the target table and the rows are added with the normal
+    ``add_rows`` path. Returns the number of rows and the column names.
+    """
+    db = db_class(path, autocommit=False,
+                  allow_b32_colnames=allow_b32_colnames)
+    try:
+        db.add_table(table)
+        for c in columns:
+            db.add_column(table, c)
+        for source in sources:
+            data = func(source)
+            if data is not None:
+                db.add_rows(table, data, add_columns=add_columns)
+        db.commit()
+        return db.count(table), db.column_names(table)
+    finally:
+        db.close()
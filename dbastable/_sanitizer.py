@@ -89,6 +89,15 @@ class _SanitizerMixin:
 
         raise TypeError(f'{type(data)} is not supported.')
 
+    @classmethod
+    def _sanitize_values(cls, data):
+        """Sanitize a sequence of values, converting numpy arrays in bulk."""
+        # numpy can convert arrays of basic types to python types at once
+        if isinstance(data, np.ndarray) and data.ndim == 1 and \
+           data.dtype.kind in 'biufUS':
+            return data.tolist()
+        return [cls._sanitize_value(d) for d in data]
+
     def _get_column_name(self, table, column):
         """Get the real column name from the database."""
         if not isinstance(column, str):
@@ -1,6 +1,20 @@
 import sqlite3 as sql
 import numpy as np
 import logging
+import math
+import os
+import random
+import shutil
+import tempfile
+import functools
+import itertools
+import threading
+import time
+import weakref
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, unquote, urlsplit
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ProcessPoolExecutor
 
 from ._viewers import (
     SQLTable,
@@ -8,12 +22,96 @@ from ._viewers import (
     SQLColumn
 )
 from ._sanitizer import _SanitizerMixin
-from .where import _WhereParserMixin, Where
+from .where import _WhereParserMixin, _InValues, _IN_TABLE_MARKER
 from ._def import _ID_KEY, _B32_COL_PREFIX
 from ._broadcaster import broadcast
+from ._appender import SQLAppender
+from ._writer import SQLWriter
+from ._parallel import _map_range, _ingest_shard, _readonly_uri
 
 
-__all__ = ['SQLDatabase', 'SQLTable', 'SQLRow', 'SQLColumn']
+__all__ = ['SQLDatabase', 'SQLTable', 'SQLRow', 'SQLColumn', 'SQLAppender',
+           'SQLWriter']
+
+
+# default maximum number of attached databases in SQLite
+_SQLITE_MAX_ATTACHED = 10
+
+# maximum time, in seconds, to wait before retrying a locked command
+_MAX_RETRY_DELAY = 1.0
+
+# default memory map size, in bytes, of read-only databases
+_READONLY_MMAP_SIZE = 2**28
+
+# maximum number of generated SQL commands kept in the template cache
+_SQL_CACHE_SIZE = 1024
+
+# number of prepared statements cached by each sqlite3 connection
+_CACHED_STATEMENTS = 512
+
+# values accepted by sqlite3 without sanitization
+_PLAIN_TYPES = {int, float, str, bytes, type(None)}
+
+
+# open databases, checked in the child processes after a fork
+_DATABASES = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    """Drop the connections inherited by a forked child process."""
+    for db in list(_DATABASES):
+        db._check_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class _ConnectionState(SimpleNamespace):
+    """State of the connection of a thread."""
+
+
+def _release_connection(con, connections, lock, pid):
+    """Close the connection of a finished thread.
+
+    Connections inherited by a forked child still belong to the parent, so
+    they are left open.
+    """
+    if os.getpid() != pid:
+        return
+    with lock:
+        if con in connections:
+            connections.remove(con)
+    con.close()
+
+
+def _is_lock_error(error):
+    """Check if a sqlite3 error was caused by a locked database."""
+    if not isinstance(error, sql.OperationalError):
+        return False
+    msg = str(error).lower()
+    return 'locked' in msg or 'busy' in msg
+
+
+def _schema_checked(func):
+    """Check the schema only once in a public method call.
+
+    The nested calls made by the method use the same check.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        state = self._state
+        if state.schema_checked:
+            return func(self, *args, **kwargs)
+        self._check_schema()
+        # local schema changes update the cache, so only the changes made
+        # by other connections are missed until the end of the call
+        state.schema_checked = True
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            state.schema_checked = False
+    return wrapper
 
 
 class _RowAccessorMixin:
@@ -28,6 +126,15 @@ class _RowAccessorMixin:
             raise IndexError('Row index out of range.')
         return row
 
+    @staticmethod
+    def _fix_row_indexes(rows, length):
+        """Fix an array of row numbers to be valid indexes."""
+        rows = np.array(rows, dtype=int, ndmin=1)
+        rows = np.where(rows < 0, rows + length, rows)
+        if np.any((rows >= length) | (rows < 0)):
+            raise IndexError('Row index out of range.')
+        return rows
+
     def _dict2row(self, table, row, add_columns=False):
         """Convert a dict to a list of data that is sorted as the columns."""
         # check if column names matches the table
@@ -86,11 +193,28 @@ class _RowAccessorMixin:
             # if no data, just return without execute
             return
 
-        comm = f"INSERT INTO {table} VALUES "
-        comm += f"(NULL, {', '.join(['?']*len(data[0]))})"
-        comm += ';'
+        n = len(data[0])
+
+        def _build():
+            comm = f"INSERT INTO {table} VALUES "
+            comm += f"(NULL, {', '.join(['?']*n)})"
+            return comm + ';'
+
+        comm = self._cached_sql(('insert', table, n), _build)
         self.executemany(comm, data)
+        self._update_count_cache(table, len(data))
+
+    def _insert_rows(self, table, columns, rows):
+        """Insert already sanitized rows, with values in the given columns."""
+        def _build():
+            comm = f"INSERT INTO {table} ({', '.join(columns)}) "
+            return comm + f"VALUES ({', '.join(['?']*len(columns))});"
 
+        comm = self._cached_sql(('insert', table, tuple(columns)), _build)
+        self.executemany(comm, rows)
+        self._update_count_cache(table, len(rows))
+
+    @_schema_checked
     def add_rows(self, table, data, add_columns=False, skip_sanitize=False):
         """Add a dict row to a table.
 
@@ -108,6 +232,7 @@ class _RowAccessorMixin:
             is already sanitized. Use with caution, as it may cause problems
             with your data.
         """
+        self._check_writable()
         self._check_table(table)
         if isinstance(data, (list, tuple)):
             return self._add_data_list(table, data,
@@ -135,6 +260,35 @@ class _RowAccessorMixin:
         raise TypeError('data must be a dict, list, or numpy array. '
                         f'Not {type(data)}.')
 
+    def appender(self, table, batch_size=1000, flush_interval=None,
+                 add_columns=False):
+        """Get a buffered appender to add rows to a table in batches.
+
+        Parameters
+        ----------
+        table: str
+            Name of the table to add the rows.
+        batch_size: int (optional)
+            Number of buffered rows that triggers a flush. Defaults to 1000.
+        flush_interval: float (optional)
+            Maximum time, in seconds, that rows stay in the buffer. It is
+            checked when new rows are appended. If None, only the
+            ``batch_size`` triggers a flush.
+        add_columns: bool (optional)
+            If True, add missing columns to the table when flushing.
+
+        Returns
+        -------
+        res : `~dbastable.SQLAppender`
+            The appender object.
+        """
+        self._check_writable()
+        self._check_table(table)
+        return SQLAppender(self, table, batch_size=batch_size,
+                           flush_interval=flush_interval,
+                           add_columns=add_columns)
+
+    @_schema_checked
     def delete_row(self, table, index):
         """Delete a row from the table.
 
@@ -145,12 +299,15 @@ class _RowAccessorMixin:
         index: int
             Index of the row to delete.
         """
+        self._check_writable()
         self._check_table(table)
         row = self._fix_row_index(index, len(self[table]))
         comm = f"DELETE FROM {table} WHERE {_ID_KEY}={row+1};"
         self.execute(comm)
+        self._update_count_cache(table, -1)
         self._update_indexes(table)
 
+    @_schema_checked
     def get_row(self, table, index):
         """Get a row from the table.
 
@@ -170,6 +327,7 @@ class _RowAccessorMixin:
         index = self._fix_row_index(index, len(self[table]))
         return SQLRow(self, table, index)
 
+    @_schema_checked
     def set_row(self, table, row, data):
         """Set a row in the table.
 
@@ -185,6 +343,7 @@ class _RowAccessorMixin:
             the column names. If `~numpy.ndarray`, dtype names are interpreted
             as column names.
         """
+        self._check_writable()
         row = self._fix_row_index(row, self.count(table))
         colnames = self.column_names(table)
 
@@ -206,6 +365,58 @@ class _RowAccessorMixin:
         self.execute(comm,
                      tuple(list(map(self._sanitize_value, data)) + [row+1]))
 
+    @_schema_checked
+    def set_rows(self, table, indexes, data):
+        """Set several rows in the table with a single command.
+
+        Parameters
+        ----------
+        table: str
+            Name of the table to set the rows.
+        indexes: list
+            Indexes of the rows to set.
+        data: dict, list or `~numpy.ndarray`
+            Data to set in the rows. If dict, keys are column names and
+            values are the lists of values of each column. Only the given
+            columns are changed. If list, each element is a row with the
+            values in the same order as the column names. If
+            `~numpy.ndarray`, dtype names are interpreted as column names.
+        """
+        self._check_writable()
+        self._check_table(table)
+        tablen = self.count(table)
+        indexes = [int(self._fix_row_index(i, tablen)) + 1
+                   for i in np.atleast_1d(indexes)]
+
+        if isinstance(data, np.ndarray) and data.dtype.names is not None:
+            data = {n: data[n] for n in data.dtype.names}
+
+        if isinstance(data, dict):
+            columns = [self._get_column_name(table, c) for c in data.keys()]
+            rows = [r[1:] for r in broadcast(indexes, *data.values())]
+        elif isinstance(data, (list, tuple, np.ndarray)):
+            columns = self.column_names(table, do_not_decode=True)
+            if len(data) != len(indexes):
+                raise ValueError('data must have the same length as '
+                                 'indexes.')
+            if any(len(r) != len(columns) for r in data):
+                raise ValueError('data must have the same number of columns '
+                                 'as the table.')
+            rows = data
+        else:
+            raise TypeError('data must be a dict, list, or numpy array. '
+                            f'Not {type(data)}.')
+
+        if len(columns) == 0 or len(indexes) == 0:
+            return
+
+        args = [tuple(map(self._sanitize_value, r)) + (i,)
+                for r, i in zip(rows, indexes)]
+        comm = f"UPDATE {table} SET "
+        comm += f"{', '.join(f'{c}=?' for c in columns)}"
+        comm += f" WHERE {_ID_KEY}=?;"
+        self.executemany(comm, args)
+
 
 class _ColumnAccessorMixin:
     """Access and manipulate columns.
@@ -215,6 +426,7 @@ class _ColumnAccessorMixin:
     - the column cache will stored in the same variable as the table cache.
     """
 
+    @_schema_checked
     def column_names(self, table, do_not_decode=False):
         """Get the column names of the table.
 
@@ -230,42 +442,31 @@ class _ColumnAccessorMixin:
         # this will initialize the cache if needed
         self._check_table(table)
 
-        # if names are cached, use the cached names
-        if self._table_cache[table] is not None:
-            if do_not_decode:
-                return self._table_cache[table]
-            return [self._decode_b32(i)
-                    if i.startswith(_B32_COL_PREFIX) else i
-                    for i in self._table_cache[table]]
-
-        # we get the column names from the cursor descriptor, so we need to
-        # select a line
-        comm = "SELECT * FROM "
-        comm += f"{table} LIMIT 1;"
-        self.execute(comm)
+        # the cache always store the real names in the database
+        if do_not_decode:
+            return list(self._table_cache[table])
+        return [self._decode_b32(i) if i.startswith(_B32_COL_PREFIX) else i
+                for i in self._table_cache[table]]
 
-        # put the names in this list. Useful to handle encoded names
-        columns = []
-        for i in self._cur.description:
-            if i[0].lower() == _ID_KEY.lower():
-                # skip id key. This should not be included in the list
-                continue
-            # handle encoded names
-            if i[0].startswith(_B32_COL_PREFIX) and \
-               self._allow_b32_colnames:
-                if not do_not_decode:
-                    columns.append(self._decode_b32(i[0]))
-                else:
-                    columns.append(i[0])  # do not lower the names here
-            else:
-                # always return a lowered normal name
-                columns.append(i[0].lower())
+    @_schema_checked
+    def column_types(self, table):
+        """Get the declared types of the columns of the table.
 
-        # add columns to the cache
-        self._table_cache[table] = columns
+        Parameters
+        ----------
+        table: str
+            Name of the table to get the column types.
 
-        return columns
+        Returns
+        -------
+        res : list
+            List of declared types, in the same order of `column_names`.
+            Columns created without type have an empty string as type.
+        """
+        self._check_table(table)
+        return list(self._type_cache[table])
 
+    @_schema_checked
     def add_column(self, table, column, data=None):
         """Add a column to a table.
 
@@ -278,6 +479,7 @@ class _ColumnAccessorMixin:
         data: list (optional)
             List of values to add to the column. If None, no data is added.
         """
+        self._check_writable()
         self._check_table(table)
 
         # check if the original column name is already in the table
@@ -295,12 +497,16 @@ class _ColumnAccessorMixin:
         self.execute(comm)
 
         # add column to the cache
+        self._own_schema()
         self._table_cache[table].append(col)
+        self._type_cache[table].append('')
+        self._update_schema_version()
 
         # adding the data to the table
         if data is not None:
             self.set_column(table, column, data)
 
+    @_schema_checked
     def delete_column(self, table, column):
         """Delete a column from a table.
 
@@ -311,6 +517,7 @@ class _ColumnAccessorMixin:
         column: str
             Name of the column to delete.
         """
+        self._check_writable()
         self._check_table(table)
 
         if column in (_ID_KEY, 'table', 'default'):
@@ -318,37 +525,92 @@ class _ColumnAccessorMixin:
         if column not in self.column_names(table):
             raise KeyError(f'Column "{column}" does not exist.')
 
-        comm = f"ALTER TABLE {table} DROP COLUMN '{column}' ;"
+        # the real column name (encoded if needed)
+        col = self._get_column_name(table, column)
+        comm = f"ALTER TABLE {table} DROP COLUMN '{col}' ;"
         self.logger.debug('deleting column "%s" from table "%s"',
-                          column, table)
+                          col, table)
         self.execute(comm)
 
         # remove column from the cache
-        self._table_cache[table].remove(column)
+        self._own_schema()
+        i = self._table_cache[table].index(col)
+        del self._table_cache[table][i]
+        del self._type_cache[table][i]
+        self._update_schema_version()
 
+    @_schema_checked
     def set_column(self, table, column, data):
         """Set a column in the table."""
-        tablen = self.count(table)
+        self._check_writable()
         column = column.lower()
 
         if column.lower() not in self.column_names(table):
             raise KeyError(f"column {column} does not exist.")
 
-        if len(data) != tablen and tablen != 0:
+        self.set_columns(table, {column: data})
+
+    @_schema_checked
+    def set_columns(self, table, data):
+        """Set several columns in the table in a single pass.
+
+        Missing columns are created, like in `add_column`. If the table is
+        empty, the rows are created with the given values.
+
+        Parameters
+        ----------
+        table: str
+            Name of the table to set the columns.
+        data: dict
+            Dictionary of columns to set. Keys are column names, values are
+            lists of values with the same length as the table.
+        """
+        self._check_writable()
+        self._check_table(table)
+        if not isinstance(data, dict):
+            raise TypeError(f'data must be a dict. Not {type(data)}.')
+        if len(data) == 0:
+            return
+
+        tablen = self.count(table)
+        lengths = set(len(d) for d in data.values())
+        if len(lengths) != 1:
+            raise ValueError("all columns must have the same length.")
+        length = lengths.pop()
+        if length != tablen and tablen != 0:
             raise ValueError("data must have the same length as the table.")
 
+        # create the missing columns
+        existing = self.column_names(table)
+        for c in data.keys():
+            if c.lower() not in existing:
+                self.add_column(table, c)
+
+        columns = [self._get_column_name(table, c) for c in data.keys()]
+        values = [self._sanitize_values(d) for d in data.values()]
+
         if tablen == 0:
-            for i in range(len(data)):
-                self.add_rows(table, {})
+            # empty tables get all the rows in a single command
+            self._insert_rows(table, columns, list(zip(*values)))
+            return
 
-        col = self._get_column_name(table, column)
-        comm = f"UPDATE {table} SET "
-        comm += f"{col}=? "
-        comm += f" WHERE {_ID_KEY}=?;"
-        args = list(zip([self._sanitize_value(d) for d in data],
-                        range(1, self.count(table)+1)))
-        self.executemany(comm, args)
+        # __id__ is dense, so the values are read by a sql function from the
+        # python lists and all the rows are written by a single UPDATE
+        def _column_value(index, column):
+            return values[column][index-1]
 
+        func = '_dbastable_column_value'
+        self._con.create_function(func, 2, _column_value, deterministic=True)
+        try:
+            comm = f"UPDATE {table} SET "
+            comm += ', '.join(f'{c}={func}({_ID_KEY}, {i})'
+                              for i, c in enumerate(columns))
+            comm += ';'
+            self.execute(comm)
+        finally:
+            self._con.create_function(func, 2, None)
+
+    @_schema_checked
     def get_column(self, table, column):
         """Get a column from the table."""
         column = column.lower()
@@ -358,18 +620,127 @@ class _ColumnAccessorMixin:
 
 
 class _TableAccessorMixin:
-    """Access and manipulate tables."""
-    _table_cache = None  # a dictionary to store table and column names
+    """Access and manipulate tables.
+
+    Notes
+    -----
+    - the schema of all tables is loaded at once and cached. The cache is
+      invalidated when ``PRAGMA schema_version`` changes, so changes made by
+      other connections are also noticed.
+    - the cache of the committed schema is shared by the connections of all
+      threads. A connection with uncommitted schema changes uses its own
+      copy until its transaction ends, as only it can see the changes.
+    """
+    _temp_counter = itertools.count()  # unique names of temporary tables
 
     @property
+    def _table_cache(self):
+        """Get the cached table and column names of the connection."""
+        return self._state.schema.tables
+
+    @property
+    def _type_cache(self):
+        """Get the cached declared column types of the connection."""
+        return self._state.schema.types
+
+    @property
+    def _sql_cache(self):
+        """Get the SQL commands generated for the cached schema."""
+        return self._state.schema.sql
+
+    def _get_schema_version(self):
+        """Get the schema version of the database."""
+        # read directly, as the pragma needs no retry or commit
+        return self._con.execute("PRAGMA schema_version;").fetchone()[0]
+
+    def _own_schema(self):
+        """Use a private copy of the schema cache, to change it locally."""
+        state = self._state
+        if state.schema_private:
+            return
+        shared = state.schema
+        state.schema = SimpleNamespace(
+            version=shared.version,
+            tables={t: list(c) for t, c in shared.tables.items()},
+            types={t: list(c) for t, c in shared.types.items()},
+            sql={}
+        )
+        state.schema_private = True
+
+    def _update_schema_version(self):
+        """Update the cached schema version after a local schema change."""
+        state = self._state
+        state.schema.sql.clear()
+        state.schema.version = self._get_schema_version()
+        if not state.con.in_transaction:
+            # the change is committed, so all connections can use it
+            with self._lock:
+                self._schema = state.schema
+            state.schema_private = False
+
+    def _load_schema(self):
+        """Load the names and columns of all tables in a single query."""
+        comm = "SELECT m.name, p.name, p.type FROM sqlite_master AS m "
+        comm += "JOIN pragma_table_info(m.name) AS p "
+        comm += "WHERE m.type='table' AND m.name!='sqlite_sequence' "
+        comm += "ORDER BY m.rowid, p.cid;"
+        tables = {}
+        types = {}
+        for table, column, ctype in self.execute(comm):
+            columns = tables.setdefault(table, [])
+            ctypes = types.setdefault(table, [])
+            if column.lower() == _ID_KEY:
+                # skip id key. This should not be included in the list
+                continue
+            # encoded names must keep their case to be decoded
+            if not column.startswith(_B32_COL_PREFIX):
+                column = column.lower()
+            columns.append(column)
+            ctypes.append(ctype)
+        return SimpleNamespace(version=None, tables=tables, types=types,
+                               sql={})
+
+    def _check_schema(self):
+        """Reload the schema cache if the database schema changed."""
+        state = self._state
+        if state.schema_checked:
+            # already checked in this public call
+            return
+        if state.schema_trusted:
+            # no other connection can change the schema, and the local
+            # changes update the cache
+            return
+        version = self._get_schema_version()
+        if state.schema_private and not state.con.in_transaction:
+            # the transaction with the local changes was committed or
+            # rolled back
+            state.schema = None
+            state.schema_private = False
+        if state.schema is not None and state.schema.version == version:
+            pass
+        elif state.con.in_transaction:
+            # the schema may have uncommitted changes, not for the others
+            self.logger.debug('loading database schema (version %i)',
+                              version)
+            state.schema = self._load_schema()
+            state.schema.version = version
+            state.schema_private = True
+        else:
+            with self._lock:
+                if self._schema is None or \
+                   self._schema.version != version:
+                    self.logger.debug('loading database schema (version %i)',
+                                      version)
+                    self._schema = self._load_schema()
+                    self._schema.version = version
+                state.schema = self._schema
+        state.schema_trusted = self._schema_static
+
+    @property
+    @_schema_checked
     def table_names(self):
         """Get the table names in the database."""
-        # use a cache for table names. Avoid querying the database every time
-        if self._table_cache is None:
-            comm = "SELECT name FROM sqlite_master WHERE type='table';"
-            tables = [i[0] for i in self.execute(comm)
-                      if i[0] != 'sqlite_sequence']
-            self._table_cache = {t: None for t in tables}
+        # the cache avoid querying all the tables every time
         return list(self._table_cache.keys())
 
     def _check_table(self, table):
@@ -377,6 +748,7 @@ class _TableAccessorMixin:
         if table not in self.table_names:
             raise KeyError(f'Table "{table}" does not exist.')
 
+    @_schema_checked
     def add_table(self, table, columns=None, data=None):
         """Create a table in database.
 
@@ -391,6 +763,7 @@ class _TableAccessorMixin:
             List of rows to add to the table. If None, no rows are added.
             Each row is a list of values in the same order as the columns.
         """
+        self._check_writable()
         self.logger.debug('Initializing "%s" table.', table)
         if table in self.table_names:
             raise ValueError('table {table} already exists.')
@@ -409,11 +782,15 @@ class _TableAccessorMixin:
         self.execute(comm)
 
         # add table to the cache
-        self._table_cache[table] = None
+        self._own_schema()
+        self._table_cache[table] = [str(c).lower() for c in columns or []]
+        self._type_cache[table] = ['']*len(self._table_cache[table])
+        self._update_schema_version()
 
         if data is not None:
             self.add_rows(table, data, add_columns=True)
 
+    @_schema_checked
     def drop_table(self, table):
         """Drop a table from the database.
 
@@ -422,13 +799,19 @@ class _TableAccessorMixin:
         table : str
             Name of the table to drop.
         """
+        self._check_writable()
         self._check_table(table)
         comm = f"DROP TABLE {table};"
         self.execute(comm)
 
         # remove table from the cache
+        self._own_schema()
         del self._table_cache[table]
+        del self._type_cache[table]
+        self._update_count_cache(table)
+        self._update_schema_version()
 
+    @_schema_checked
     def get_table(self, table):
         """Get a table from the database.
 
@@ -449,6 +832,7 @@ class _TableAccessorMixin:
 class _ItemAccessorMixin:
     """Access and manipulate items."""
 
+    @_schema_checked
     def get_item(self, table, column, row):
         """Get an item from the table.
 
@@ -470,6 +854,7 @@ class _ItemAccessorMixin:
         row = self._fix_row_index(row, len(self[table]))
         return self.get_column(table, column)[row]
 
+    @_schema_checked
     def set_item(self, table, column, row, value):
         """Set a value in a cell.
 
@@ -484,12 +869,43 @@ class _ItemAccessorMixin:
         value: object
             Value to set in the cell.
         """
+        self._check_writable()
         row = self._fix_row_index(row, self.count(table))
         col = self._get_column_name(table, column)
         value = self._sanitize_value(value)
         self.execute(f"UPDATE {table} SET {col}=? "
                      f"WHERE {_ID_KEY}=?;", (value, row+1))
 
+    @_schema_checked
+    def set_items(self, table, column, indexes, values):
+        """Set the values of several cells of a column with a single command.
+
+        Parameters
+        ----------
+        table: str
+            Name of the table to set the items.
+        column: str
+            Name of the column to set the items.
+        indexes: list
+            Indexes of the rows to set.
+        values: list or object
+            Values to set in the cells, in the same order as ``indexes``. If
+            a single value is given, it is set in all the cells.
+        """
+        self._check_writable()
+        self._check_table(table)
+        tablen = self.count(table)
+        col = self._get_column_name(table, column)
+        indexes = [int(self._fix_row_index(i, tablen)) + 1
+                   for i in np.atleast_1d(indexes)]
+        if len(indexes) == 0:
+            return
+
+        args = [(self._sanitize_value(v), i)
+                for i, v in broadcast(indexes, values)]
+        self.executemany(f"UPDATE {table} SET {col}=? "
+                         f"WHERE {_ID_KEY}=?;", args)
+
 
 class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
                   _ItemAccessorMixin, _RowAccessorMixin,
@@ -500,7 +916,11 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
     ----------
     db : str
         The name of the database file. If ':memory:' or None is given, the
-        database will be created in memory.
+        database will be created in memory. Names starting with 'file:' are
+        opened as URIs. Use ``'file:name?mode=memory&cache=shared'`` to
+        create a named in-memory database shared by all the connections of
+        the process that use the same name. It exists while any of them is
+        open.
     autocommit : bool (optional)
         Whether to commit changes to the database after each operation.
         Defaults to True.
@@ -510,6 +930,51 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
         With a column name is invalid, it will be encoded in base32 and a
         prefix will be added. This is useful to avoid invalid characters like
         '-' in column names. If False, an error will be raised instead.
+    cache_counts : bool (optional)
+        If True, the number of rows of each table is cached and updated
+        locally when rows are added or deleted. The cache is invalidated when
+        ``PRAGMA data_version`` shows that another connection changed the
+        database. Rows added or deleted with custom commands sent to
+        `execute` are not tracked. Defaults to False.
+    thread_safe : bool (optional)
+        If True, each thread uses its own connection to the database, all of
+        them sharing the cache of the committed schema, and the database is
+        set to the WAL journal mode, so readers of different threads do not
+        block each other. Counts of ``cache_counts`` are kept by each
+        connection. Only databases stored in files or in shared memory are
+        supported. Defaults to False.
+    busy_timeout : float (optional)
+        Time, in seconds, each command waits for a database locked by other
+        connections before failing. If None, the ``timeout`` of
+        `~sqlite3.connect` is used, which defaults to 5 seconds.
+    retries : int (optional)
+        Number of times a command that failed because the database was
+        locked is executed again. Commands are only retried when they are not
+        part of a larger transaction, so ``autocommit`` must be True.
+        Defaults to 0.
+    retry_backoff : float (optional)
+        Base time, in seconds, to wait before retrying a command. It doubles
+        at each retry, up to 1 second, and is multiplied by a random factor
+        between 0.5 and 1.5, so concurrent writers do not retry at the same
+        time. Defaults to 0.05.
+    cache_in_memory : bool or str (optional)
+        If True or 'close', the database file is loaded into memory when
+        opened and all the commands use this working copy. The changes are
+        only written back to the file by `flush` and `close`. If 'commit',
+        they are also written back by `commit`, when there are any. Not
+        compatible with ``thread_safe``. Defaults to False.
+    readonly : bool (optional)
+        If True, the database file is opened in read-only mode. Commits are
+        skipped and all the methods that change the database raise
+        `PermissionError`. Defaults to False.
+    immutable : bool (optional)
+        If True, the database file is assumed to never change, by this or any
+        other process, so SQLite reads it without any locking or change
+        detection. Implies ``readonly``. Defaults to False.
+    mmap_size : int (optional)
+        Maximum number of bytes of the database file mapped in memory. If
+        None, 256 MiB for read-only databases and the SQLite default
+        otherwise.
     **kwargs
         Keyword arguments to pass to the `~sqlite3.connect` function.
 
@@ -518,21 +983,274 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
     - '__id__' is only for internal indexing. It is ignored on returns.
     - '__b32__' will be used as prefix for base32 encoded column names. So
       it is not allowed to use this prefix in column names.
+    - Databases stored in files, and their viewers, can be pickled and sent
+      to other processes. Only the path and the options are pickled and the
+      connection is opened again when first used. Connections inherited by
+      forked processes are never used, new ones are opened instead.
+      Databases stored in memory are pickled with all their data, see
+      `to_bytes`.
+    - Shared in-memory databases lock whole tables. A thread writing to a
+      table makes the other threads fail with 'database table is locked'
+      until it commits. Use `writer` to write from a single thread, or
+      ``retries``.
+    - With ``cache_in_memory``, each write back copies the whole database to
+      the file. With ``autocommit``, the 'commit' mode copies it after every
+      change, so group the changes in transactions.
     """
 
     def __init__(self, db=None, autocommit=True, logger=None,
-                 allow_b32_colnames=False, **kwargs):
+                 allow_b32_colnames=False, cache_counts=False,
+                 thread_safe=False, busy_timeout=None, retries=0,
+                 retry_backoff=0.05, cache_in_memory=False, readonly=False,
+                 immutable=False, mmap_size=None, **kwargs):
+        self._setup(db, autocommit=autocommit, logger=logger,
+                    allow_b32_colnames=allow_b32_colnames,
+                    cache_counts=cache_counts, thread_safe=thread_safe,
+                    busy_timeout=busy_timeout, retries=retries,
+                    retry_backoff=retry_backoff,
+                    cache_in_memory=cache_in_memory, readonly=readonly,
+                    immutable=immutable, mmap_size=mmap_size, **kwargs)
+
+        # open the first connection now, so errors are raised here
+        self._ensure_connected()
+        if thread_safe and not self._is_memory and not self._readonly:
+            self.execute("PRAGMA journal_mode=WAL;")
+
+    def _setup(self, db, autocommit, logger, allow_b32_colnames,
+               cache_counts, thread_safe, busy_timeout=None, retries=0,
+               retry_backoff=0.05, cache_in_memory=False, readonly=False,
+               immutable=False, mmap_size=None, **kwargs):
+        """Set the options of the database, without connecting to it."""
+        # set first, so a failed setup can still be closed
+        self._connections = []
+        self._local = SimpleNamespace()
+        self._cache_in_memory = False
+        self._readonly = False
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._schema = None  # cache of the committed schema
+        _DATABASES.add(self)
+        if retries < 0:
+            raise ValueError('retries must be a non-negative integer.')
         self._db = db
-        self._con = sql.connect(self._db or ':memory:', **kwargs)
-        self._cur = self._con.cursor()
         self.autocommit = autocommit
         self.logger = logger or logging.getLogger(__name__)
         self._allow_b32_colnames = allow_b32_colnames
+        self._cache_counts = cache_counts
+        self._kwargs = kwargs
+        self._thread_safe = thread_safe
+        self._busy_timeout = busy_timeout
+        self.retries = int(retries)
+        self.retry_backoff = retry_backoff
+        self._lock_waits = 0
+        self._lock_errors = 0
+
+        if cache_in_memory is True:
+            cache_in_memory = 'close'
+        if cache_in_memory not in (False, 'commit', 'close'):
+            raise ValueError('cache_in_memory must be a bool, "commit" or '
+                             f'"close". Not {cache_in_memory}.')
+        if cache_in_memory and (self._is_memory or thread_safe):
+            raise ValueError('cache_in_memory is only supported for '
+                             'databases stored in files, without '
+                             'thread_safe.')
+        self._cache_in_memory = cache_in_memory
+
+        if (readonly or immutable) and self._is_memory:
+            raise ValueError('readonly is only supported for databases '
+                             'stored in files.')
+        self._readonly = bool(readonly or immutable)
+        self._immutable = bool(immutable)
+        # only the single connection to a private copy can change its schema
+        self._schema_static = self._immutable or bool(cache_in_memory) or \
+            (self._is_memory and not self._is_shared_memory)
+        if mmap_size is None and self._readonly:
+            mmap_size = _READONLY_MMAP_SIZE
+        self._mmap_size = mmap_size
+
+        if str(db).startswith('file:'):
+            self._kwargs = kwargs = {'uri': True, **kwargs}
+
+        if thread_safe:
+            if self._is_memory and not self._is_shared_memory:
+                raise ValueError('thread_safe is only supported for '
+                                 'databases stored in files or in shared '
+                                 'memory.')
+            # connections are closed by the thread that closes the database
+            self._kwargs = {**kwargs, 'check_same_thread': False}
+            self._local = threading.local()
+
+    def _check_fork(self):
+        """Drop the connections inherited from a parent process.
+
+        SQLite connections must not be used across a fork, so file databases
+        are reopened in the child process. The inherited connections are not
+        closed, as they still belong to the parent. Called for all the
+        databases right after a fork, so the connection state needs no pid
+        check.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+        if self._is_memory:
+            # memory databases exist only in the inherited connection
+            return
+        self._connections = []
+        self._local = threading.local() if self._thread_safe \
+            else SimpleNamespace()
+
+    def _connect(self):
+        """Open a new connection to the database."""
+        kwargs = {'cached_statements': _CACHED_STATEMENTS, **self._kwargs}
+        if self._cache_in_memory:
+            # load the file into the working copy
+            con = sql.connect(':memory:', **kwargs)
+            if self._readonly:
+                src = sql.connect(self._readonly_uri(),
+                                  **{**self._kwargs, 'uri': True})
+            else:
+                src = sql.connect(self._db, **self._kwargs)
+            try:
+                src.backup(con)
+            finally:
+                src.close()
+        elif self._readonly:
+            con = sql.connect(self._readonly_uri(), **{**kwargs, 'uri': True})
+        else:
+            con = sql.connect(self._db or ':memory:', **kwargs)
+        # use the sqlite3 trace callback to log all sql commands. The logger
+        # is referenced directly to avoid a reference cycle with self
+        logger = self.logger
+        con.set_trace_callback(lambda x:
+                               logger.debug('executing sql: %s',
+                                            x.replace('\n', ' ')))
+        if self._busy_timeout is not None:
+            ms = int(self._busy_timeout*1000)
+            con.execute(f"PRAGMA busy_timeout = {ms};")
+        if self._mmap_size is not None:
+            con.execute(f"PRAGMA mmap_size = {int(self._mmap_size)};")
+        return con
+
+    def _readonly_uri(self):
+        """Get the URI to open the database in read-only mode."""
+        if not str(self._db).startswith('file:'):
+            return _readonly_uri(self._db, immutable=self._immutable)
+        uri = str(self._db)
+        params = '&mode=ro' + ('&immutable=1' if self._immutable else '')
+        return uri + params if '?' in uri else uri + '?' + params[1:]
+
+    def _check_writable(self):
+        """Raise an error if the database is read-only."""
+        if self._readonly:
+            raise PermissionError(f'database {self._db} is read-only.')
+
+    @property
+    def stats(self):
+        """Get the statistics of the database connections.
+
+        Returns
+        -------
+        res : dict
+            Dictionary with the number of ``lock_waits``, the retries of
+            commands that failed because the database was locked, and the
+            number of ``lock_errors`` raised after all the retries.
+        """
+        return {'lock_waits': self._lock_waits,
+                'lock_errors': self._lock_errors}
+
+    def _retry(self, func, can_retry):
+        """Call a function, retrying it while the database is locked.
+
+        ``func`` must leave the database as it was before the call when it
+        fails, so it can be called again.
+        """
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except sql.Error as e:
+                if not _is_lock_error(e):
+                    raise e
+                if not can_retry or attempt >= self.retries:
+                    with self._lock:
+                        self._lock_errors += 1
+                    raise e
+            # jittered exponential backoff
+            delay = min(self.retry_backoff*2**attempt, _MAX_RETRY_DELAY)
+            delay *= random.uniform(0.5, 1.5)
+            attempt += 1
+            with self._lock:
+                self._lock_waits += 1
+            self.logger.debug('database locked, retry %i in %.3f s.',
+                              attempt, delay)
+            time.sleep(delay)
+
+    @property
+    def _state(self):
+        """Get the connection state of the current thread."""
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            con = self._connect()
+            state = _ConnectionState(con=con, cur=con.cursor(),
+                                     txn_depth=0, untracked=0,
+                                     untracking=False, data_version=None,
+                                     schema_checked=False,
+                                     schema_trusted=False, temp_tables=[],
+                                     count_cache={}, schema=None,
+                                     schema_private=False, flushed=None)
+            state.flushed = self._changes_marker(state)
+            self._local.state = state
+            with self._lock:
+                self._connections.append(con)
+            if self._thread_safe:
+                # the state dies with its thread
+                weakref.finalize(state, _release_connection, con,
+                                 self._connections, self._lock, self._pid)
+        return state
+
+    def _ensure_connected(self):
+        """Open the connection of the current thread, if not opened yet."""
+        return self._state
 
-        # use the sqlite3 trace callback to log all sql commands
-        self._con.set_trace_callback(lambda x:
-                                     self.logger.debug('executing sql: %s',
-                                                       x.replace('\n', ' ')))
+    @property
+    def _con(self):
+        """Get the connection of the current thread."""
+        return self._state.con
+
+    @property
+    def _cur(self):
+        """Get the cursor of the current thread."""
+        return self._state.cur
+
+    @property
+    def _count_cache(self):
+        """Get the cached number of rows of the connection.
+
+        Uncommitted changes are only seen by the connection that made them,
+        so each connection keeps its own counts.
+        """
+        return self._state.count_cache
+
+    def close(self):
+        """Close all the connections to the database."""
+        self._check_fork()
+        state = getattr(self._local, 'state', None)
+        if self._cache_in_memory and not self._readonly and \
+           state is not None and \
+           state.con in self._connections:
+            # uncommitted changes are discarded, like in files
+            state.con.rollback()
+            self._flush_memory()
+        with self._lock:
+            connections, self._connections = self._connections, []
+            for con in connections:
+                try:
+                    con.close()
+                except sql.ProgrammingError:
+                    # connections of other threads are closed when garbage
+                    # collected
+                    pass
 
     def execute(self, command, arguments=None):
         """Execute a SQL command in the database.
@@ -550,19 +1268,26 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
         res : list
             List of tuples with the results of the command.
         """
-        try:
-            # sqlite3 have problems with None arguments
-            # so we should not pass any arguments if None
-            if arguments is None:
-                self._cur.execute(command)
-            else:
-                self._cur.execute(command, arguments)
-            res = self._cur.fetchall()
-        except sql.Error as e:
-            self._con.rollback()
-            raise e
-
-        if self.autocommit:
+        def _execute():
+            try:
+                # sqlite3 have problems with None arguments
+                # so we should not pass any arguments if None
+                if arguments is None:
+                    self._cur.execute(command)
+                else:
+                    self._cur.execute(command, arguments)
+                return self._cur.fetchall()
+            except sql.Error as e:
+                self._rollback()
+                raise e
+
+        state = self._state
+        if not state.schema_checked:
+            # commands of the user may change the schema
+            state.schema_trusted = False
+        res = self._retry(_execute, self._can_retry)
+
+        if self.autocommit and not state.txn_depth:
             self.commit()
         return res
 
@@ -582,21 +1307,284 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
         res : list
             List of tuples with the results of the command.
         """
-        try:
-            self._cur.executemany(command, arguments)
-            res = self._cur.fetchall()
-        except sql.Error as e:
-            self._con.rollback()
-            raise e
-
-        if self.autocommit:
+        can_retry = self._can_retry
+        if can_retry and self.retries and \
+           not isinstance(arguments, (list, tuple)):
+            # iterators are consumed by the first try
+            arguments = list(arguments)
+
+        def _executemany():
+            try:
+                self._cur.executemany(command, arguments)
+                return self._cur.fetchall()
+            except sql.Error as e:
+                self._rollback()
+                raise e
+
+        state = self._state
+        if not state.schema_checked:
+            # commands of the user may change the schema
+            state.schema_trusted = False
+        res = self._retry(_executemany, can_retry)
+
+        if self.autocommit and not state.txn_depth:
             self.commit()
         return res
 
+    @property
+    def _can_retry(self):
+        """Check if the commands are executed in their own transactions."""
+        return self.autocommit and not self._state.txn_depth
+
     def commit(self):
-        """Commit the current transaction."""
-        self._con.commit()
+        """Commit the current transaction.
+
+        If the database is locked, the commit is retried according to the
+        ``retries`` policy. The transaction is kept if it fails. Read-only
+        databases are never committed.
+        """
+        if self._readonly:
+            return
+        self._retry(self._con.commit, True)
+        if self._cache_in_memory == 'commit':
+            self._flush_memory()
+
+    def flush(self):
+        """Commit the current transaction and write all the changes to disk.
 
+        With ``cache_in_memory``, the working copy is written back to the
+        database file. Otherwise, it is the same as `commit`.
+        """
+        if self._readonly:
+            return
+        self._retry(self._con.commit, True)
+        if self._cache_in_memory:
+            self._flush_memory()
+
+    @staticmethod
+    def _changes_marker(state):
+        """Get a value that changes when the data or the schema changes."""
+        con = state.con
+        version = con.execute("PRAGMA schema_version;").fetchone()[0]
+        return con.total_changes - state.untracked, version
+
+    @contextmanager
+    def _untracked_changes(self):
+        """Ignore the changes made inside the block in the changes marker.
+
+        Used for temporary and attached databases, which are not written
+        back by ``cache_in_memory``.
+        """
+        state = self._state
+        if state.untracking:
+            # nested blocks are counted by the outer one
+            yield
+            return
+        start = state.con.total_changes
+        state.untracking = True
+        try:
+            yield
+        finally:
+            state.untracking = False
+            state.untracked += state.con.total_changes - start
+
+    def _flush_memory(self):
+        """Write the in-memory working copy back to the database file."""
+        state = self._state
+        marker = self._changes_marker(state)
+        if marker == state.flushed:
+            return
+        self.logger.debug('writing the working copy to %s', self._db)
+        dest = sql.connect(self._db, **self._kwargs)
+        try:
+            state.con.backup(dest)
+        finally:
+            dest.close()
+        state.flushed = marker
+
+    @contextmanager
+    def _transaction(self):
+        """Group all the commands executed inside in a single transaction.
+
+        With ``autocommit``, the transaction is committed at the end, or
+        rolled back if any error happens. Without ``autocommit``, the user
+        keeps the control of the transaction and nothing is committed.
+        Nested calls join the outer transaction.
+        """
+        state = self._state
+        state.txn_depth += 1
+        try:
+            if state.txn_depth == 1 and self.autocommit and \
+               not state.con.in_transaction:
+                self.execute("BEGIN;")
+            yield
+        except BaseException:
+            if state.txn_depth == 1 and self.autocommit:
+                self._rollback()
+            raise
+        else:
+            if state.txn_depth == 1 and self.autocommit:
+                self.commit()
+        finally:
+            state.txn_depth -= 1
+
+    @contextmanager
+    def snapshot(self):
+        """Read a consistent version of the database inside a block.
+
+        A read transaction is opened at the start of the block, so all the
+        reads inside it, including the ones made by the viewers, see the
+        database as it was at that moment. The database is set to the WAL
+        journal mode, so other connections can keep writing while the
+        snapshot is open.
+
+        Examples
+        --------
+        >>> with db.snapshot():  # doctest: +SKIP
+        ...     a = db['table']['a'].values
+        ...     b = db['table']['b'].values
+
+        Notes
+        -----
+        - Only databases stored in files are supported. The journal mode of
+          the file is changed to WAL permanently, unless it is read-only.
+        - The snapshot can not start with uncommitted changes.
+        - The transaction is committed at the end of the block, or rolled
+          back if an error happens. Writing inside the snapshot may fail if
+          other connections changed the database after it started.
+        - In ``thread_safe`` mode, the snapshot is only seen by the thread
+          that opened it.
+        - Nested snapshots join the outer one.
+        """
+        if self._is_memory or self._cache_in_memory:
+            raise ValueError('snapshot can only be used with databases '
+                             'stored in files, without cache_in_memory.')
+        state = self._state
+        if state.txn_depth:
+            # already inside a transaction
+            yield self
+            return
+        if state.con.in_transaction:
+            raise ValueError('snapshot can not start with uncommitted '
+                             'changes. Commit them first.')
+        if not self._readonly and \
+           self.execute("PRAGMA journal_mode;")[0][0] != 'wal':
+            self.execute("PRAGMA journal_mode=WAL;")
+
+        state.txn_depth += 1
+        try:
+            self.execute("BEGIN;")
+            # the snapshot is only taken by the first read
+            self.execute("SELECT 1 FROM sqlite_master LIMIT 1;")
+            yield self
+        except BaseException:
+            self._rollback()
+            raise
+        else:
+            # the read transaction must end also in read-only databases
+            self._retry(state.con.commit, True)
+        finally:
+            state.txn_depth -= 1
+
+    @contextmanager
+    def _temp_table(self, values):
+        """Load values in a temporary table, keeping their order.
+
+        The table has the ``ord`` column, with the position of each value
+        starting at 1, and the ``value`` column. It exists only in the
+        connection of the current thread and is dropped at the end.
+        """
+        name = f'__dbastable_tmp{next(self._temp_counter)}__'
+        self.execute(f"CREATE TEMP TABLE {name} "
+                     "(ord INTEGER PRIMARY KEY, value);")
+        try:
+            # the connection is used directly, so the commit of execute
+            # does not see the changes of the temporary table. Temporary
+            # tables are never locked by other connections
+            with self._untracked_changes():
+                self._con.executemany(f"INSERT INTO temp.{name} (value) "
+                                      "VALUES (?);", ((v,) for v in values))
+            yield f'temp.{name}'
+        finally:
+            self._state.temp_tables.append(name)
+            self._drop_temp_tables()
+
+    def _drop_temp_tables(self):
+        """Drop the temporary tables that are not used anymore.
+
+        Tables cannot be dropped while other cursors of the connection are
+        reading, so the tables are emptied and dropped in a later call.
+        """
+        state = self._state
+        for name in list(state.temp_tables):
+            try:
+                # a locked table must not be retried, only other cursors
+                # can release it
+                state.con.execute(f"DROP TABLE IF EXISTS temp.{name};")
+            except sql.OperationalError as e:
+                if not _is_lock_error(e):
+                    raise
+                with self._untracked_changes():
+                    state.con.execute(f"DELETE FROM temp.{name};")
+            else:
+                state.temp_tables.remove(name)
+        if not state.txn_depth and (self.autocommit or self._readonly):
+            # commit does nothing in read-only databases, but the
+            # transaction opened by the temporary table must end to
+            # release the read lock
+            state.con.commit()
+
+    @contextmanager
+    def _in_tables(self, comm, args):
+        """Load the large IN lists of a command in temporary tables.
+
+        Yields the command reading the values from the tables and the
+        remaining arguments. The tables are dropped at the end.
+        """
+        if args is None or not any(isinstance(a, _InValues) for a in args):
+            yield comm, args
+            return
+
+        lists = [a for a in args if isinstance(a, _InValues)]
+        args = [a for a in args if not isinstance(a, _InValues)] or None
+        with ExitStack() as stack:
+            for i, values in enumerate(lists):
+                # python basic types need no sanitization
+                if not set(map(type, values)) <= _PLAIN_TYPES:
+                    values = self._sanitize_values(values)
+                name = stack.enter_context(self._temp_table(values))
+                comm = comm.replace(_IN_TABLE_MARKER.format(i), name)
+            yield comm, args
+
+    def _rollback(self):
+        """Rollback the current transaction, discarding cached counts."""
+        self._con.rollback()
+        self._count_cache.clear()
+        # schema changes may be rolled back too
+        self._state.schema_trusted = False
+
+    def _check_data_version(self):
+        """Clear the count cache if another connection changed the data."""
+        # data_version is specific of each connection
+        state = self._state
+        version = self._con.execute("PRAGMA data_version;").fetchone()[0]
+        if version != state.data_version:
+            state.count_cache.clear()
+            state.data_version = version
+
+    def _update_count_cache(self, table, delta=None):
+        """Update the cached number of rows of a table after local changes.
+
+        If ``delta`` is None, the cached value is discarded.
+        """
+        if table not in self._count_cache:
+            return
+        if delta is None:
+            del self._count_cache[table]
+        else:
+            self._count_cache[table] += delta
+
+    @_schema_checked
     def count(self, table, where=None):
         """Get the number of rows in the table.
 
@@ -615,14 +1603,32 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
             Number of rows in the table.
         """
         self._check_table(table)
-        comm = "SELECT COUNT(*) FROM "
-        comm += f"{table} "
-        where, args = self._parse_where(table, where)
-        if where is not None:
-            comm += f"WHERE {where}"
-        comm += ";"
-        return self.execute(comm, args)[0][0]
+        if where is None and self._cache_counts:
+            self._check_data_version()
+            if table in self._count_cache:
+                return self._count_cache[table]
+
+        shape, values = self._where_shape(where)
+
+        def _build():
+            comm = "SELECT COUNT(*) FROM "
+            comm += f"{table} "
+            if shape is not None:
+                comm += f"WHERE {self._where_sql(table, shape)}"
+            return comm + ";"
+
+        comm = self._cached_sql(('count', table, shape), _build)
+        args = None
+        if values is not None:
+            args = self._where_args(values)
+        with self._in_tables(comm, args) as (comm, args):
+            res = self.execute(comm, args)[0][0]
+
+        if where is None and self._cache_counts:
+            self._count_cache[table] = res
+        return res
 
+    @_schema_checked
     def select(self, table, columns=None, where=None, order=None, limit=None,
                offset=None):
         """Select rows from a table.
@@ -652,31 +1658,75 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
             List of tuples with the selected rows. Each row values will be
             returned in a tuple in the same order as the columns.
         """
-        self._check_table(table)
-        if columns is None:
-            columns = self[table].column_names
-        columns = np.atleast_1d(columns)
-        # only use sanitized column names
-        columns = ', '.join([self._get_column_name(table, c) for c in columns])
+        comm, args = self._select_command(table, columns=columns, where=where,
+                                          order=order, limit=limit,
+                                          offset=offset)
+        with self._in_tables(comm, args) as (comm, args):
+            res = self.execute(comm, args)
+        return res
 
-        comm = f"SELECT {columns} "
-        comm += f"FROM {table} "
-        args = []
+    def iter_select(self, table, columns=None, where=None, order=None,
+                    limit=None, offset=None, chunk_size=1000):
+        """Iterate over the rows selected from a table in chunks.
 
-        where, args_w = self._parse_where(table, where)
-        if where is not None:
-            comm += f"WHERE {where} "
-            # values need to be sanitized
-            args += args_w
+        The rows are fetched from the database only when needed, so large
+        selections do not need to fit in memory. See `select`.
 
+        Parameters
+        ----------
+        table: str
+            Name of the table to select from.
+        columns, where, order, limit, offset
+            Same as in `select`.
+        chunk_size : int (optional)
+            Number of rows in each chunk. Defaults to 1000.
+
+        Yields
+        ------
+        res : list
+            List of tuples with at most ``chunk_size`` selected rows.
+        """
+        comm, args = self._select_command(table, columns=columns, where=where,
+                                          order=order, limit=limit,
+                                          offset=offset)
+        with self._in_tables(comm, args) as (comm, args):
+            # a dedicated cursor keeps the other commands working while
+            # iterating
+            cur = self._con.cursor()
+            try:
+                if args is None:
+                    cur.execute(comm)
+                else:
+                    cur.execute(comm, args)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if len(rows) == 0:
+                        break
+                    yield rows
+            finally:
+                # the cursor must be closed before dropping temporary tables
+                cur.close()
+
+    @_schema_checked
+    def _select_command(self, table, columns=None, where=None, order=None,
+                        limit=None, offset=None):
+        """Build the command and the arguments of a select.
+
+        The command is cached by the shape of the query, so repeated queries
+        only need to sanitize the values.
+        """
+        self._check_table(table)
+        if columns is not None:
+            columns = self._as_key(columns)
         if order is not None:
-            order = np.atleast_1d(order)
-            # only operates on real column names
-            order = [self._get_column_name(table, o) for o in order]
-            comm += f"ORDER BY {', '.join(order)} ASC "
+            order = self._as_key(order)
+        shape, values = self._where_shape(where)
+        args = []
+        if values is not None:
+            # values need to be sanitized
+            args += self._where_args(values)
 
         if limit is not None:
-            comm += "LIMIT ? "
             if not isinstance(limit, (int, np.integer)):
                 raise TypeError('limit must be an integer.')
             # force integer
@@ -686,33 +1736,477 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
                 raise ValueError('offset cannot be used without limit.')
             if not isinstance(offset, (int, np.integer)):
                 raise TypeError('offset must be an integer.')
-            comm += "OFFSET ? "
             # force integer
             args.append(int(offset))
 
-        comm = comm + ';'
+        def _build():
+            cols = columns
+            if cols is None:
+                cols = self[table].column_names
+            # only use sanitized column names
+            cols = ', '.join([self._get_column_name(table, c) for c in cols])
+
+            comm = f"SELECT {cols} "
+            comm += f"FROM {table} "
+            if shape is not None:
+                comm += f"WHERE {self._where_sql(table, shape)} "
+            if order is not None:
+                # only operates on real column names
+                o = [self._get_column_name(table, c) for c in order]
+                comm += f"ORDER BY {', '.join(o)} ASC "
+            if limit is not None:
+                comm += "LIMIT ? "
+            if offset is not None:
+                comm += "OFFSET ? "
+            return comm + ';'
+
+        key = ('select', table, columns, shape, order, limit is not None,
+               offset is not None)
+        comm = self._cached_sql(key, _build)
 
         if args == []:
             args = None
-        res = self.execute(comm, args)
+        return comm, args
+
+    @staticmethod
+    def _as_key(names):
+        """Convert a name or a list of names to a hashable tuple."""
+        if isinstance(names, str):
+            return (names,)
+        return tuple(np.atleast_1d(names).tolist())
+
+    def _cached_sql(self, key, build):
+        """Get a generated SQL command from the template cache.
+
+        ``build`` is only called when the key is not cached. The cache is
+        cleared when the schema changes.
+        """
+        comm = self._sql_cache.get(key)
+        if comm is None:
+            comm = build()
+            if len(self._sql_cache) >= _SQL_CACHE_SIZE:
+                self._sql_cache.clear()
+            self._sql_cache[key] = comm
+        return comm
+
+    @_schema_checked
+    def update(self, table, values, where=None):
+        """Update the values of all rows matching a condition.
+
+        Parameters
+        ----------
+        table: str
+            Name of the table to update.
+        values : dict
+            Dictionary of values to set. Keys are column names, values are
+            the new values of the cells.
+        where : dict (optional)
+            Dictionary of conditions to select rows to update. Keys are column
+            names, values are values to compare. If it is a dict of values,
+            all rows equal to the values will be updated. If it is a dict of
+            `~dbastable.where.Where` objects, the conditions will be combined
+            with the AND operator. If None, all rows are updated.
+
+        Returns
+        -------
+        res : int
+            Number of rows affected by the update.
+        """
+        self._check_writable()
+        self._check_table(table)
+        if not isinstance(values, dict):
+            raise TypeError('values must be a dict. '
+                            f'Not {type(values)}.')
+        if len(values) == 0:
+            return 0
+
+        columns = [self._get_column_name(table, c) for c in values.keys()]
+        args = [self._sanitize_value(v) for v in values.values()]
+        comm = f"UPDATE {table} SET "
+        comm += f"{', '.join(f'{c}=?' for c in columns)} "
+
+        where, args_w = self._parse_where(table, where)
+        if where is not None:
+            comm += f"WHERE {where} "
+            args += args_w
+        comm += ';'
+
+        with self._in_tables(comm, args) as (comm, args):
+            self.execute(comm, args)
+            return self._cur.rowcount
+
+    def writer(self, queue_size=1000, batch_size=100):
+        """Get a background writer that accepts jobs from many threads.
+
+        The writer owns a new connection to the database in a dedicated
+        thread and groups the submitted jobs in transactions.
+
+        Parameters
+        ----------
+        queue_size : int (optional)
+            Maximum number of jobs waiting to be written. Defaults to 1000.
+        batch_size : int (optional)
+            Maximum number of jobs grouped in a single transaction. Defaults
+            to 100.
+
+        Returns
+        -------
+        res : `~dbastable.SQLWriter`
+            The writer object. Close it to stop the thread.
+        """
+        self._check_writable()
+        if (self._is_memory and not self._is_shared_memory) or \
+           self._cache_in_memory:
+            raise ValueError('A writer can only be used with databases '
+                             'stored in files, without cache_in_memory, or '
+                             'in shared memory.')
+        # the writer connection must see all the data already written
+        self.commit()
+        return SQLWriter(self, queue_size=queue_size, batch_size=batch_size)
+
+    @_schema_checked
+    def parallel_map(self, table, func, columns=None, n_workers=None,
+                     chunk_size=None):
+        """Apply a function to each row of a table using several processes.
+
+        The table is split in ranges of ``__id__``. Each worker process opens
+        its own read-only connection, streams the rows of one range and
+        applies the function to them.
+
+        Parameters
+        ----------
+        table: str
+            Name of the table.
+        func : callable
+            Function applied to each row. It receives a tuple with the values
+            of the selected columns. It must be picklable, like functions
+            defined at module level.
+        columns : list (optional)
+            List of columns passed to the function. If None, all columns.
+        n_workers : int (optional)
+            Number of worker processes. If None, the number of CPUs.
+        chunk_size : int (optional)
+            Number of rows in each range. If None, the table is split in
+            four ranges per worker.
+
+        Returns
+        -------
+        res : list
+            List of the function results, in the same order as the rows.
+
+        Notes
+        -----
+        - Only databases stored in files are supported. Pending changes are
+          committed before the workers start.
+        """
+        if self._is_memory:
+            raise ValueError('parallel_map can only be used with databases '
+                             'stored in files.')
+        self._check_table(table)
+        if columns is None:
+            columns = self.column_names(table)
+        columns = np.atleast_1d(columns)
+        columns = ', '.join([self._get_column_name(table, c)
+                             for c in columns])
+
+        n_workers = n_workers or os.cpu_count() or 1
+        tablen = self.count(table)
+        if tablen == 0:
+            return []
+        chunk_size = chunk_size or math.ceil(tablen/(4*n_workers))
+
+        # the workers must see all the data
+        self.flush()
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_map_range, self._path, table, columns,
+                                   start, start+chunk_size, func)
+                       for start in range(1, tablen+1, chunk_size)]
+            res = []
+            for f in futures:
+                res.extend(f.result())
         return res
 
-    def copy(self, indexes=None):
+    @_schema_checked
+    def ingest(self, table, sources, func, add_columns=False,
+               n_workers=None):
+        """Add the data read from many sources using several processes.
+
+        The sources are split in contiguous groups. Each worker process reads
+        one group, calling ``func`` for each source, and adds the data to its
+        own temporary shard database with `add_rows`. The shards are then
+        attached to this database and merged into the table in a single
+        transaction, keeping the order of the sources.
+
+        Parameters
+        ----------
+        table: str
+            Name of the table. It is created if it does not exist.
+        sources : list
+            List of sources, like file names. They must be picklable.
+        func : callable
+            Function that reads a source and returns the data to add, in any
+            format accepted by `add_rows`, or None to skip the source. It must
+            be picklable, like functions defined at module level.
+        add_columns : bool (optional)
+            If True, add missing columns to the table.
+        n_workers : int (optional)
+            Number of worker processes. If None, the number of CPUs. Limited
+            to the number of databases SQLite can attach at once.
+
+        Returns
+        -------
+        n : int
+            Number of rows added to the table.
+
+        Notes
+        -----
+        - Only databases stored in files are supported. The shards are
+          created in a temporary directory next to the database file and
+          removed after the merge.
+        - Pending changes are committed before the merge, and the merge is
+          committed at the end.
+        """
+        self._check_writable()
+        if self._is_memory:
+            raise ValueError('ingest can only be used with databases '
+                             'stored in files.')
+        sources = list(sources)
+        if table not in self.table_names:
+            self.add_table(table)
+        columns = self.column_names(table)
+        if len(sources) == 0:
+            return 0
+
+        n_workers = n_workers or os.cpu_count() or 1
+        n_shards = min(n_workers, len(sources), _SQLITE_MAX_ATTACHED)
+        size = math.ceil(len(sources)/n_shards)
+        groups = [sources[i:i+size] for i in range(0, len(sources), size)]
+
+        folder = os.path.dirname(os.path.abspath(self._path))
+        tmp = tempfile.mkdtemp(prefix='dbastable-ingest-', dir=folder)
+        try:
+            shards = [os.path.join(tmp, f'shard{i}.db')
+                      for i in range(len(groups))]
+            with ProcessPoolExecutor(max_workers=n_shards) as pool:
+                futures = [pool.submit(_ingest_shard, self.__class__, s,
+                                       table, columns, g, func, add_columns,
+                                       self._allow_b32_colnames)
+                           for s, g in zip(shards, groups)]
+                results = [f.result() for f in futures]
+            return self._merge_shards(table, shards, results)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _merge_shards(self, table, shards, results):
+        """Merge the shard databases created by `ingest` into a table."""
+        for _, names in results:
+            for c in names:
+                if c not in self.column_names(table):
+                    self.add_column(table, c)
+
+        # ATTACH is not allowed inside a transaction
+        self.commit()
+        aliases = [f'__dbastable_shard{i}__' for i in range(len(shards))]
+        for alias, shard in zip(aliases, shards):
+            self.execute(f"ATTACH DATABASE ? AS {alias};", (shard,))
+        try:
+            total = 0
+            with self._transaction():
+                offset = self.count(table)
+                for alias, (n, names) in zip(aliases, results):
+                    if n == 0:
+                        continue
+                    cols = [self._get_column_name(table, c) for c in names]
+                    comm = f"INSERT INTO main.{table} "
+                    comm += f"({', '.join([_ID_KEY] + cols)}) "
+                    comm += f"SELECT {', '.join([f'{_ID_KEY}+?'] + cols)} "
+                    comm += f"FROM {alias}.{table} ORDER BY {_ID_KEY};"
+                    self.execute(comm, (offset,))
+                    offset += n
+                    total += n
+            self.commit()
+            self._update_count_cache(table, total)
+            return total
+        finally:
+            for alias in aliases:
+                self.execute(f"DETACH DATABASE {alias};")
+
+    @_schema_checked
+    def copy(self, indexes=None, destination=None, progress=None,
+             pages=-1):
         """Get a copy of the database.
 
+        The copy is made entirely by SQLite, without reading the rows into
+        Python. Complete copies use the SQLite backup API, page by page.
+        Filtered copies attach the destination to this database and copy the
+        selected rows with ``INSERT ... SELECT``.
+
         Parameters
         ----------
         indexes : dict, optional
             A dictionary of table names and the indexes of the rows in each
-            table to copy. If None, all rows are copied.
+            table to copy. Rows are copied in the given order. Tables not in
+            the dictionary are copied entirely. If None, all rows are copied.
+        destination : str, optional
+            Name of the file of the new database. It must not exist. If None,
+            the copy is stored in memory.
+        progress : callable, optional
+            Function called during complete copies with the ``status``, the
+            ``remaining`` and the ``total`` number of pages. See
+            `~sqlite3.Connection.backup`.
+        pages : int, optional
+            Number of pages copied at each step of a complete copy. If zero
+            or negative, the database is copied in a single step.
+
+        Returns
+        -------
+        db : SQLDatabase
+            A copy of the database.
+
+        Notes
+        -----
+        - Pending changes are committed before copying.
+        """
+        dest_memory = destination in (None, '', ':memory:')
+        if not dest_memory and os.path.exists(destination):
+            raise ValueError(f'destination {destination} already exists.')
+
+        self.commit()
+        if indexes is None:
+            db = self.__class__(None if dest_memory else destination,
+                                logger=self.logger,
+                                allow_b32_colnames=self._allow_b32_colnames)
+            self._con.backup(db._con, pages=pages, progress=progress)
+            return db
+        return self._copy_filtered(indexes, destination, dest_memory)
+
+    def to_bytes(self):
+        """Serialize the whole database to bytes.
+
+        The bytes are the same as the content of a database file, so they
+        can be sent to other processes and loaded with `from_bytes`, without
+        touching the filesystem.
+
+        Returns
+        -------
+        data : bytes
+            The serialized database.
+
+        Notes
+        -----
+        - Pending changes are committed before serializing.
+        - Requires Python 3.11 or newer.
+        """
+        if not hasattr(sql.Connection, 'serialize'):
+            raise NotImplementedError('serializing databases requires '
+                                      'Python 3.11 or newer.')
+        self.commit()
+        return self._con.serialize()
+
+    @classmethod
+    def from_bytes(cls, data, **kwargs):
+        """Load a database serialized with `to_bytes` into memory.
+
+        Parameters
+        ----------
+        data : bytes
+            The serialized database. Any buffer with the content of a
+            database file is accepted.
+        **kwargs
+            Keyword arguments to pass to `SQLDatabase`.
+
+        Returns
+        -------
+        db : SQLDatabase
+            A new database stored in memory.
         """
-        return self.__copy__(indexes=indexes)
+        if not hasattr(sql.Connection, 'deserialize'):
+            raise NotImplementedError('deserializing databases requires '
+                                      'Python 3.11 or newer.')
+        db = cls(None, **kwargs)
+        db._con.deserialize(data)
+        return db
+
+    def _copy_filtered(self, indexes, destination, dest_memory):
+        """Copy selected rows to a database attached to this one."""
+        alias = '__dbastable_copy__'
+        self.execute(f"ATTACH DATABASE ? AS {alias};",
+                     (':memory:' if dest_memory else destination,))
+        try:
+            # only the attached database is changed
+            with self._transaction(), self._untracked_changes():
+                for table in self.table_names:
+                    info = self.execute(f"PRAGMA main.table_info({table});")
+                    cols = [f'"{i[1]}" {i[2]}'.strip() for i in info
+                            if i[1] != _ID_KEY]
+                    comm = f'CREATE TABLE {alias}."{table}" ('
+                    comm += f"{_ID_KEY} INTEGER PRIMARY KEY AUTOINCREMENT"
+                    comm += ''.join([f', {c}' for c in cols]) + ');'
+                    self.execute(comm)
+
+                    if table not in indexes:
+                        self.execute(f"INSERT INTO {alias}.{table} "
+                                     f"SELECT * FROM main.{table} "
+                                     f"ORDER BY {_ID_KEY};")
+                        continue
+
+                    indx = self._fix_row_indexes(indexes[table],
+                                                 self.count(table)) + 1
+                    names = [f'"{i[1]}"' for i in info if i[1] != _ID_KEY]
+                    if len(indx) == 0 or len(names) == 0:
+                        continue
+                    # ids are created in the order of the indexes
+                    with self._temp_table(indx.tolist()) as tmp:
+                        comm = f"INSERT INTO {alias}.{table} "
+                        comm += f"({', '.join(names)}) SELECT "
+                        comm += ', '.join([f't.{n}' for n in names])
+                        comm += f" FROM {tmp} AS i JOIN main.{table} AS t "
+                        comm += f"ON t.{_ID_KEY} = i.value ORDER BY i.ord;"
+                        self.execute(comm)
+            # also with readonly, when commit skips the main database
+            self._con.commit()
+
+            db = self.__class__(None if dest_memory else destination,
+                                logger=self.logger,
+                                allow_b32_colnames=self._allow_b32_colnames)
+            if dest_memory:
+                self._con.backup(db._con, name=alias)
+        finally:
+            self.execute(f"DETACH DATABASE {alias};")
+        return db
 
     @property
     def db(self):
         """Get the database name."""
         return str(self._db)
 
+    @property
+    def _uri_params(self):
+        """Get the query parameters of a database given as an URI."""
+        if not str(self._db).startswith('file:'):
+            return {}
+        return dict(parse_qsl(str(self._db).partition('?')[2]))
+
+    @property
+    def _path(self):
+        """Get the path of the database file, also for URIs."""
+        if not str(self._db).startswith('file:'):
+            return self._db
+        return unquote(urlsplit(str(self._db)).path)
+
+    @property
+    def _is_memory(self):
+        """Check if the database is stored only in memory."""
+        if self._db in (None, '', ':memory:'):
+            return True
+        return self._uri_params.get('mode') == 'memory' or \
+            str(self._db).startswith('file::memory:')
+
+    @property
+    def _is_shared_memory(self):
+        """Check if the database is a named in-memory shared database."""
+        return self._is_memory and self._uri_params.get('cache') == 'shared'
+
     def _get_indexes(self, table):
         """Get the indexes of the table."""
         comm = f"SELECT {_ID_KEY} FROM {table};"
@@ -724,7 +2218,11 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
         origin = self._get_indexes(table)
         comm = f"UPDATE {table} SET {_ID_KEY} = ? WHERE {_ID_KEY} = ?;"
         self.executemany(comm, zip(rows, origin))
+        # reset the autoincrement counter, so new rows keep the ids dense
+        comm = "UPDATE sqlite_sequence SET seq = ? WHERE name = ?;"
+        self.execute(comm, (len(rows), table))
 
+    @_schema_checked
     def index_of(self, table, where):
         """Get the index(es) where a given condition is satisfied."""
         indx = self.select(table, _ID_KEY, where=where)
@@ -732,15 +2230,108 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
             return indx[0][0]-1
         return [i[0]-1 for i in indx]
 
+    @_schema_checked
+    def index_of_many(self, table, column, values, duplicates='first'):
+        """Get the indexes of the rows matching each one of many values.
+
+        All the values are matched at once, with a single join against a
+        temporary table, instead of one query per value.
+
+        Parameters
+        ----------
+        table : str
+            Name of the table.
+        column : str
+            Name of the column to compare with the values.
+        values : list or `~numpy.ndarray`
+            Values to look for.
+        duplicates : {'first', 'last', 'error'} (optional)
+            What to do when more than one row matches a value. ``'first'``
+            and ``'last'`` get the smallest and the largest matching index.
+            ``'error'`` raises a `ValueError`. Defaults to ``'first'``.
+
+        Returns
+        -------
+        res : `~numpy.ndarray`
+            Index of the row matching each value, in the same order of the
+            values. Values not found get ``-1``.
+        """
+        if duplicates not in ('first', 'last', 'error'):
+            raise ValueError("duplicates must be 'first', 'last' or "
+                             "'error'.")
+        self._check_table(table)
+        column = self._get_column_name(table, column)
+        values = self._sanitize_values(values)
+        if len(values) == 0:
+            return np.array([], dtype=int)
+
+        agg = 'MAX' if duplicates == 'last' else 'MIN'
+        with self._temp_table(values) as tmp:
+            # the rows of the temporary table keep the order of the values
+            comm = f"SELECT {agg}(t.{_ID_KEY}), COUNT(t.{_ID_KEY}) "
+            comm += f"FROM {tmp} AS v LEFT JOIN {table} AS t "
+            comm += f"ON t.{column} = v.value GROUP BY v.ord ORDER BY v.ord;"
+            res = self.execute(comm)
+
+        res = np.array(res, dtype=float).reshape(-1, 2)
+        if duplicates == 'error' and np.any(res[:, 1] > 1):
+            first = values[int(np.argmax(res[:, 1] > 1))]
+            raise ValueError(f'value {first!r} matches more than one row in '
+                             f'column {column}.')
+        return np.where(np.isnan(res[:, 0]), 0, res[:, 0]).astype(int) - 1
+
+    @_schema_checked
     def __len__(self):
         """Get the number of rows in the current table."""
         return len(self.table_names)
 
+    def __getstate__(self):
+        """Get the state to pickle the database as a lightweight handle.
+
+        Only the database path and options are pickled. The connection is
+        opened again when the database is first used after unpickling.
+        Databases stored in memory are pickled with all their data.
+        """
+        data = None
+        if self._is_memory:
+            try:
+                data = self.to_bytes()
+            except NotImplementedError:
+                raise TypeError('databases stored only in memory cannot be '
+                                'pickled in this Python version.')
+        # memory databases are restored as private ones
+        return {'db': None if data is not None else self._db,
+                'data': data,
+                'autocommit': self.autocommit,
+                'logger': self.logger.name,
+                'allow_b32_colnames': self._allow_b32_colnames,
+                'cache_counts': self._cache_counts,
+                'thread_safe': self._thread_safe and data is None,
+                'busy_timeout': self._busy_timeout,
+                'retries': self.retries,
+                'retry_backoff': self.retry_backoff,
+                'cache_in_memory': self._cache_in_memory,
+                'readonly': self._readonly,
+                'immutable': self._immutable,
+                'mmap_size': self._mmap_size,
+                'kwargs': self._kwargs}
+
+    def __setstate__(self, state):
+        """Restore a pickled database. The connection is opened lazily."""
+        state = dict(state)
+        kwargs = state.pop('kwargs')
+        data = state.pop('data', None)
+        state['logger'] = logging.getLogger(state['logger'])
+        self._setup(**state, **kwargs)
+        if data is not None:
+            self._con.deserialize(data)
+
     def __del__(self):
         """Delete the class, closing the db connection."""
         # ensure connection is closed.
-        self._con.close()
+        self.close()
 
+    @_schema_checked
     def __setitem__(self, item, value):
         """Set a row in the table."""
         if not isinstance(item, tuple):
@@ -751,6 +2342,7 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
             raise KeyError('first item must be the table name.')
         self.get_table(item[0])[item[1:]] = value
 
+    @_schema_checked
     def __getitem__(self, item):
         """Get a items from the table."""
         if isinstance(item, (str, np.str_)):
@@ -764,6 +2356,7 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
                          'db[table, row], db[table, column] or '
                          'db[table, column, row].')
 
+    @_schema_checked
     def __repr__(self):
         """Get a string representation of the table."""
         s = f"{self.__class__.__name__} '{self.db}' at {hex(id(self))}:"
@@ -775,41 +2368,5 @@ class SQLDatabase(_WhereParserMixin, _SanitizerMixin,
         return s
 
     def __copy__(self, indexes=None):
-        """Copy the database.
-
-        Parameters
-        ----------
-        indexes : dict, optional
-            A dictionary of table names and  the indexes of the rows in each
-            table to copy. If None, all rows are copied.
-
-        Returns
-        -------
-        db : SQLDatabase
-            A copy of the database.
-        """
-        def _get_data(table, indx=None):
-            if indx is None:
-                return self.select(table)
-            if len(indx) == 0:
-                return None
-            # indexes must be fixed
-            t = self.count(table)
-            indx = [self._fix_row_index(i, t) + 1 for i in np.atleast_1d(indx)]
-            where = Where(_ID_KEY, 'IN', indx)
-
-            # select will return in sorted way. We need to unsort it
-            s = np.argsort(indx).argsort()
-            values = self.select(table, where=where)
-            return [values[i] for i in s]
-
-        # when copying, always copy to memory
-        db = SQLDatabase(':memory:')
-        if indexes is None:
-            indexes = {}
-        for i in self.table_names:
-            db.add_table(i, columns=self.column_names(i))
-            rows = _get_data(i, indexes.get(i, None))
-            if rows is not None:
-                db.add_rows(i, rows, skip_sanitize=True)
-        return db
+        """Copy the database to memory. See `copy`."""
+        return self.copy(indexes=indexes)
@@ -67,6 +67,25 @@ class SQLTable:
         """
         return self._db.select(self._name, **kwargs)
 
+    def iter_select(self, chunk_size=1000, **kwargs):
+        """Iterate over chunks of rows selected from the table.
+        See `~dbastable.SQLDatabase.iter_select`.
+
+        Parameters
+        ----------
+        chunk_size : int (optional)
+            Number of rows in each chunk.
+        **kwargs
+            Same arguments of `select`.
+
+        Yields
+        ------
+        res : list
+            List of tuples with at most ``chunk_size`` selected rows.
+        """
+        yield from self._db.iter_select(self._name, chunk_size=chunk_size,
+                                        **kwargs)
+
     def as_table(self):
         """Return the current table as an `~astropy.table.Table` object."""
         from astropy.table import Table
@@ -103,6 +122,29 @@ class SQLTable:
         """
         self._db.add_rows(self._name, data, add_columns=add_columns)
 
+    def appender(self, batch_size=1000, flush_interval=None,
+                 add_columns=False):
+        """Get a buffered appender to add rows to the table in batches.
+        See `~dbastable.SQLDatabase.appender`.
+
+        Parameters
+        ----------
+        batch_size : int (optional)
+            Number of buffered rows that triggers a flush.
+        flush_interval : float (optional)
+            Maximum time, in seconds, that rows stay in the buffer.
+        add_columns : bool (optional)
+            If True, add missing columns to the table when flushing.
+
+        Returns
+        -------
+        res : `~dbastable.SQLAppender`
+            The appender object.
+        """
+        return self._db.appender(self._name, batch_size=batch_size,
+                                 flush_interval=flush_interval,
+                                 add_columns=add_columns)
+
     def get_column(self, column):
         """Get a given column from the table.
         See `~dbastable.SQLDatabase.get_column`.
@@ -148,6 +190,18 @@ class SQLTable:
         """
         self._db.set_column(self._name, column, data)
 
+    def set_columns(self, data):
+        """Set several columns in the table in a single pass.
+        See `~dbastable.SQLDatabase.set_columns`.
+
+        Parameters
+        ----------
+        data : dict
+            Dictionary of columns to set. Keys are column names, values are
+            lists of values. Missing columns are created.
+        """
+        self._db.set_columns(self._name, data)
+
     def set_row(self, row, data):
         """Set a given row in the table.
         See `~dbastable.SQLDatabase.set_row`.
@@ -164,6 +218,39 @@ class SQLTable:
         """
         self._db.set_row(self._name, row, data)
 
+    def set_rows(self, indexes, data):
+        """Set several rows in the table with a single command.
+        See `~dbastable.SQLDatabase.set_rows`.
+
+        Parameters
+        ----------
+        indexes : list
+            Row indexes.
+        data : dict, list or `~numpy.ndarray`
+            Data to set in the rows. If dict, keys are column names and
+            values are the lists of values of each column. If list, each
+            element is a row with the values in the same order as the column
+            names. If `~numpy.ndarray`, dtype names are interpreted as column
+            names.
+        """
+        self._db.set_rows(self._name, indexes, data)
+
+    def set_items(self, column, indexes, values):
+        """Set several cells of a column with a single command.
+        See `~dbastable.SQLDatabase.set_items`.
+
+        Parameters
+        ----------
+        column : str
+            Column name.
+        indexes : list
+            Row indexes.
+        values : list or object
+            Values to set in the cells. If a single value is given, it is set
+            in all the cells.
+        """
+        self._db.set_items(self._name, column, indexes, values)
+
     def delete_column(self, column):
         """Delete a given column from the table.
         See `~dbastable.SQLDatabase.delete_column`.
@@ -206,6 +293,99 @@ class SQLTable:
         """
         return self._db.index_of(self._name, where)
 
+    def index_of_many(self, column, values, duplicates='first'):
+        """Get the indexes of the rows matching each one of many values.
+        See `~dbastable.SQLDatabase.index_of_many`.
+
+        Parameters
+        ----------
+        column : str
+            Name of the column to compare with the values.
+        values : list or `~numpy.ndarray`
+            Values to look for.
+        duplicates : {'first', 'last', 'error'} (optional)
+            What to do when more than one row matches a value.
+
+        Returns
+        -------
+        res : `~numpy.ndarray`
+            Index of the row matching each value. ``-1`` if not found.
+        """
+        return self._db.index_of_many(self._name, column, values,
+                                      duplicates=duplicates)
+
+    def update(self, values, where=None):
+        """Update the values of all rows matching a condition.
+        See `~dbastable.SQLDatabase.update`.
+
+        Parameters
+        ----------
+        values : dict
+            Dictionary of values to set. Keys are column names, values are
+            the new values of the cells.
+        where : dict (optional)
+            Dictionary of conditions to select rows to update. Keys are column
+            names, values are values to compare. If it is a dict of values,
+            all rows equal to the values will be updated. If it is a dict of
+            `~dbastable.where.Where` objects, the conditions will be combined
+            with the AND operator. If None, all rows are updated.
+
+        Returns
+        -------
+        res : int
+            Number of rows affected by the update.
+        """
+        return self._db.update(self._name, values, where=where)
+
+    def parallel_map(self, func, columns=None, n_workers=None,
+                     chunk_size=None):
+        """Apply a function to each row of the table using several processes.
+        See `~dbastable.SQLDatabase.parallel_map`.
+
+        Parameters
+        ----------
+        func : callable
+            Picklable function applied to each row tuple.
+        columns : list (optional)
+            List of columns passed to the function. If None, all columns.
+        n_workers : int (optional)
+            Number of worker processes. If None, the number of CPUs.
+        chunk_size : int (optional)
+            Number of rows processed by each task.
+
+        Returns
+        -------
+        res : list
+            List of the function results, in the same order as the rows.
+        """
+        return self._db.parallel_map(self._name, func, columns=columns,
+                                     n_workers=n_workers,
+                                     chunk_size=chunk_size)
+
+    def ingest(self, sources, func, add_columns=False, n_workers=None):
+        """Add the data read from many sources using several processes.
+        See `~dbastable.SQLDatabase.ingest`.
+
+        Parameters
+        ----------
+        sources : list
+            List of picklable sources, like file names.
+        func : callable
+            Picklable function that reads a source and returns the data to
+            add.
+        add_columns : bool (optional)
+            If True, add missing columns to the table.
+        n_workers : int (optional)
+            Number of worker processes. If None, the number of CPUs.
+
+        Returns
+        -------
+        n : int
+            Number of rows added to the table.
+        """
+        return self._db.ingest(self._name, sources, func,
+                               add_columns=add_columns, n_workers=n_workers)
+
     def _resolve_tuple(self, key):
         """Resolve how tuples keys are handled."""
         col, row = key
@@ -330,9 +510,9 @@ class SQLColumn:
         if isinstance(key, (int, np.int_)):
             self._db.set_item(self._table, self._name, key, value)
         elif isinstance(key, (slice, list, np.ndarray)):
-            v = np.array(self.values)
-            v[key] = value
-            self._db.set_column(self._table, self._name, v)
+            # resolve slices, masks and negative indexes like numpy
+            indexes = np.arange(self._db.count(self._table))[key]
+            self._db.set_items(self._table, self._name, indexes, value)
         else:
             raise IndexError(f'{key}')
 
@@ -0,0 +1,238 @@
+"""Background writer thread to ingest data from many producer threads."""
+import queue
+import threading
+from concurrent.futures import Future
+
+
+_STOP = object()  # sentinel to stop the writer thread
+
+
+class SQLWriter:
+    """Write to a database from a dedicated thread.
+
+    The writer opens its own connection to the database inside a dedicated
+    thread. Jobs submitted by any number of producer threads are put in a
+    bounded queue and the writer groups them in transactions. Each submission
+    returns a `~concurrent.futures.Future` that holds the result or the error
+    of the job.
+
+    Parameters
+    ----------
+    db : SQLDatabase
+        The parent database object. Must be stored in a file.
+    queue_size : int (optional)
+        Maximum number of jobs waiting in the queue. When the queue is full,
+        producers block until there is space. Defaults to 1000.
+    batch_size : int (optional)
+        Maximum number of jobs grouped in a single transaction. Defaults to
+        100.
+
+    Notes
+    -----
+    - Data passed to the jobs must not be changed by the producers after
+      the submission.
+    - If a job of a group fails, the group is rolled back and its jobs are
+      executed again one by one, so only the failing job gets the error.
+    - The thread is a daemon thread. Jobs still in the queue when the
+      interpreter exits are lost, so always `close` the writer.
+    """
+
+    def __init__(self, db, queue_size=1000, batch_size=100):
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer.')
+        self._parent = db
+        self.batch_size = int(batch_size)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._lock = threading.Lock()
+
+        self._n_jobs = 0
+        self._n_transactions = 0
+
+        self._ready = Future()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='dbastable-writer')
+        self._thread.start()
+        # raise here any error happened when opening the connection
+        self._ready.result()
+
+    @property
+    def stats(self):
+        """Get the statistics of the writer.
+
+        Returns
+        -------
+        res : dict
+            Dictionary with the number of executed ``jobs``, the number of
+            committed ``transactions`` and the ``pending`` jobs in the queue.
+        """
+        return {'jobs': self._n_jobs,
+                'transactions': self._n_transactions,
+                'pending': self._queue.qsize()}
+
+    def _open(self):
+        """Open the connection of the writer thread."""
+        parent = self._parent
+        # the connection can be garbage collected by any thread
+        kwargs = {**parent._kwargs, 'check_same_thread': False}
+        return parent.__class__(parent._db, autocommit=True,
+                                logger=parent.logger,
+                                allow_b32_colnames=parent._allow_b32_colnames,
+                                busy_timeout=parent._busy_timeout,
+                                retries=parent.retries,
+                                retry_backoff=parent.retry_backoff,
+                                **kwargs)
+
+    def _run(self):
+        """Main loop of the writer thread."""
+        try:
+            db = self._open()
+        except BaseException as e:
+            self._ready.set_exception(e)
+            return
+        self._ready.set_result(None)
+
+        stop = False
+        while not stop:
+            jobs = [self._queue.get()]
+            # group the jobs already waiting in the queue
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if _STOP in jobs:
+                stop = True
+            running = [j for j in jobs if j is not _STOP and
+                       j[0].set_running_or_notify_cancel()]
+            try:
+                self._execute(db, running)
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+
+        db.close()
+
+        # jobs submitted while closing are not executed
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            job[0].set_exception(ValueError('writer is closed.'))
+            self._queue.task_done()
+
+    def _execute(self, db, jobs):
+        """Execute a group of jobs in a single transaction."""
+        if len(jobs) == 0:
+            return
+        try:
+            with db._transaction():
+                results = [getattr(db, method)(*args, **kwargs)
+                           for _, method, args, kwargs in jobs]
+        except Exception:
+            # the group was rolled back. Run the jobs again one by one, so
+            # only the failing ones get the error
+            for job in jobs:
+                self._execute_single(db, job)
+            return
+
+        self._n_transactions += 1
+        self._n_jobs += len(jobs)
+        for (future, _, _, _), res in zip(jobs, results):
+            future.set_result(res)
+
+    def _execute_single(self, db, job):
+        """Execute a single job in its own transaction."""
+        future, method, args, kwargs = job
+        try:
+            with db._transaction():
+                res = getattr(db, method)(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            self._n_transactions += 1
+            self._n_jobs += 1
+            future.set_result(res)
+
+    def submit(self, method, *args, **kwargs):
+        """Submit a job calling a `~dbastable.SQLDatabase` method.
+
+        Parameters
+        ----------
+        method : str
+            Name of the `~dbastable.SQLDatabase` method to call.
+        *args, **kwargs
+            Arguments passed to the method.
+
+        Returns
+        -------
+        res : `~concurrent.futures.Future`
+            Future with the value returned by the method.
+        """
+        future = Future()
+        # the job must be queued before close puts the stop sentinel, or
+        # the writer thread may never see it
+        with self._lock:
+            if self._closed:
+                raise ValueError('writer is closed.')
+            self._queue.put((future, method, args, kwargs))
+        return future
+
+    def add_rows(self, table, data, add_columns=False):
+        """Add rows to a table. See `~dbastable.SQLDatabase.add_rows`.
+
+        Returns
+        -------
+        res : `~concurrent.futures.Future`
+            Future of the job.
+        """
+        return self.submit('add_rows', table, data, add_columns=add_columns)
+
+    def set_items(self, table, column, indexes, values):
+        """Set several cells of a column.
+        See `~dbastable.SQLDatabase.set_items`.
+
+        Returns
+        -------
+        res : `~concurrent.futures.Future`
+            Future of the job.
+        """
+        return self.submit('set_items', table, column, indexes, values)
+
+    def update(self, table, values, where=None):
+        """Update the rows matching a condition.
+        See `~dbastable.SQLDatabase.update`.
+
+        Returns
+        -------
+        res : `~concurrent.futures.Future`
+            Future with the number of affected rows.
+        """
+        return self.submit('update', table, values, where=where)
+
+    def flush(self):
+        """Block until all the submitted jobs are finished."""
+        self._queue.join()
+
+    def close(self):
+        """Finish all the submitted jobs and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        """Get a string representation of the writer."""
+        s = f"{self.__class__.__name__} for database '{self._parent.db}' "
+        s += f"({self._queue.qsize()} pending jobs)"
+        return s
@@ -0,0 +1,91 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# flake8: noqa: F403, F405
+
+import time
+import numpy as np
+from dbastable import SQLDatabase, SQLAppender
+
+from dbastable.tests.mixins import TestCaseWithNumpyCompare
+
+
+class TestSQLAppender(TestCaseWithNumpyCompare):
+    @property
+    def db(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test', columns=['a', 'b'])
+        return db
+
+    def test_appender_batch_size(self):
+        db = self.db
+        app = db.appender('test', batch_size=3)
+        self.assertIsInstance(app, SQLAppender)
+        self.assertEqual(app.table, 'test')
+
+        app.append({'a': 1, 'b': 2})
+        app.append([3, 4])
+        self.assertEqual(app.pending, 2)
+        self.assertEqual(db.count('test'), 0)
+
+        app.append((5, np.int64(6)))
+        self.assertEqual(app.pending, 0)
+        self.assertEqual(db.select('test'), [(1, 2), (3, 4), (5, 6)])
+
+        app.append({'b': 8})
+        app.flush()
+        self.assertEqual(db.select('test')[-1], (None, 8))
+
+        stats = app.stats
+        self.assertEqual(stats['rows'], 4)
+        self.assertEqual(stats['flushes'], 2)
+        self.assertEqual(stats['pending'], 0)
+        self.assertGreater(stats['rows_per_second'], 0)
+
+    def test_appender_context_manager(self):
+        db = self.db
+        with db['test'].appender(batch_size=1000) as app:
+            app.extend([{'a': i, 'b': -i} for i in range(10)])
+            self.assertEqual(db.count('test'), 0)
+        self.assertEqual(db.count('test'), 10)
+        self.assertEqualArray(db['test']['b'].values, -np.arange(10))
+
+        with self.assertRaisesRegex(ValueError, 'closed'):
+            app.append([1, 2])
+
+    def test_appender_flush_interval(self):
+        db = self.db
+        app = db.appender('test', batch_size=1000, flush_interval=0.01)
+        app.append([1, 2])
+        time.sleep(0.02)
+        app.append([3, 4])
+        self.assertEqual(app.pending, 0)
+        self.assertEqual(db.count('test'), 2)
+
+    def test_appender_add_columns(self):
+        db = self.db
+        app = db.appender('test', add_columns=True)
+        app.append([1, 2])
+        app.append({'a': 3, 'C': 4})
+        app.flush()
+        self.assertEqual(db.column_names('test'), ['a', 'b', 'c'])
+        self.assertEqual(db.select('test'), [(1, 2, None), (3, None, 4)])
+
+    def test_appender_invalid(self):
+        db = self.db
+        app = db.appender('test')
+        app.append({'c': 1})
+        with self.assertRaises(KeyError):
+            app.flush()
+        # rows are kept if the flush fails
+        self.assertEqual(app.pending, 1)
+
+        app = db.appender('test')
+        app.append([1, 2, 3])
+        with self.assertRaises(ValueError):
+            app.flush()
+
+        with self.assertRaises(TypeError):
+            app.append(1)
+        with self.assertRaises(ValueError):
+            db.appender('test', batch_size=0)
+        with self.assertRaises(KeyError):
+            db.appender('not_a_table')
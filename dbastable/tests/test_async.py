@@ -0,0 +1,154 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# flake8: noqa: F403, F405
+
+import asyncio
+import contextlib
+import gc
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from dbastable import AsyncSQLDatabase, AsyncSQLTable, Where
+
+from dbastable.tests.mixins import TestCaseWithNumpyCompare
+
+
+class TestAsyncSQLDatabase(TestCaseWithNumpyCompare):
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_async_basic(self):
+        async def main():
+            async with AsyncSQLDatabase(':memory:') as db:
+                await db.add_table('test', columns=['a', 'b'])
+                await db.add_rows('test', {'a': np.arange(10),
+                                           'b': np.arange(10, 20)})
+                self.assertEqual(await db.table_names(), ['test'])
+                self.assertEqual(await db.column_names('test'), ['a', 'b'])
+                self.assertEqual(await db.count('test'), 10)
+                self.assertEqual(await db.select('test', columns='b',
+                                                 where={'a': 2}),
+                                 [(12,)])
+                self.assertEqual(await db.update('test', {'b': 0},
+                                                 where=Where('a', '<', 3)),
+                                 3)
+                self.assertEqual(await db.index_of('test', {'a': 5}), 5)
+                self.assertEqualArray(await db.index_of_many('test', 'a',
+                                                             [5, 20]),
+                                      [5, -1])
+                await db.set_items('test', 'a', [0, 1], [-1, -2])
+                self.assertEqual(await db.get_item('test', 'a', 1), -2)
+
+                # the connection lives in the worker thread
+                self.assertIsNot(db._sync._local.state.con, None)
+                with self.assertRaises(KeyError):
+                    await db.count('not_a_table')
+
+        self.run_async(main())
+
+    def test_async_table(self):
+        async def main():
+            async with AsyncSQLDatabase() as db:
+                await db.add_table('test')
+                table = await db.get_table('test')
+                self.assertIsInstance(table, AsyncSQLTable)
+                self.assertEqual(table.name, 'test')
+                await table.set_columns({'a': [1, 2, 3], 'b': [4, 5, 6]})
+                await table.add_rows({'a': 7, 'b': 8})
+                self.assertEqual(await table.count(), 4)
+                self.assertEqual(await table.values(),
+                                 [(1, 4), (2, 5), (3, 6), (7, 8)])
+                await table.delete_row(0)
+                self.assertEqual(await db['test'].select(columns='a'),
+                                 [(2,), (3,), (7,)])
+                with self.assertRaises(KeyError):
+                    await db.get_table('not_a_table')
+
+        self.run_async(main())
+
+    def test_async_iter_select(self):
+        async def main():
+            async with AsyncSQLDatabase() as db:
+                await db.add_table('test')
+                await db.add_column('test', 'a', data=np.arange(25))
+                chunks = [c async for c in db.iter_select('test',
+                                                          chunk_size=10)]
+                self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+                self.assertEqual(sum(chunks, []), [(i,) for i in range(25)])
+
+                # concurrent tasks do not block each other
+                res = await asyncio.gather(db.count('test'),
+                                           db['test'].count(),
+                                           db.select('test', limit=1))
+                self.assertEqual(res, [25, 25, [(0,)]])
+
+        self.run_async(main())
+
+    @unittest.skipIf(sys.platform.startswith("win"),
+                     "problems with temp_path")
+    def test_async_pool(self):
+        tmp_path = tempfile.mkdtemp()
+        path = os.path.join(tmp_path, 'test.db')
+
+        async def main():
+            async with AsyncSQLDatabase(path, max_workers=3) as db:
+                await db.add_table('test')
+                await db.add_column('test', 'a', data=np.arange(100))
+                res = await asyncio.gather(*[db.count('test',
+                                                      where={'a': i})
+                                             for i in range(100)])
+                self.assertEqual(res, [1]*100)
+
+        try:
+            self.run_async(main())
+        finally:
+            shutil.rmtree(tmp_path)
+
+    @unittest.skipIf(sys.platform.startswith("win"),
+                     "problems with temp_path")
+    @unittest.skipIf(sys.version_info < (3, 10),
+                     "contextlib.aclosing requires Python 3.10")
+    def test_async_pool_iter_select_break(self):
+        tmp_path = tempfile.mkdtemp()
+        path = os.path.join(tmp_path, 'test.db')
+        where = Where('a', 'in', list(range(2000)))
+
+        def temp_tables(db):
+            return sum([c.execute("SELECT name FROM temp.sqlite_master;"
+                                  ).fetchall()
+                        for c in db.sync._connections], [])
+
+        async def main():
+            async with AsyncSQLDatabase(path, max_workers=4) as db:
+                await db.add_table('test')
+                await db.add_column('test', 'a', data=np.arange(100))
+
+                async def first_chunk():
+                    async with contextlib.aclosing(
+                            db.iter_select('test', where=where,
+                                           chunk_size=10)) as it:
+                        async for rows in it:
+                            return rows
+
+                res = await asyncio.gather(*[first_chunk()
+                                             for i in range(20)])
+                self.assertEqual(res, [[(i,) for i in range(10)]]*20)
+                self.assertEqual(temp_tables(db), [])
+
+                # iterations left open are finished when closing
+                iters = []
+                for i in range(5):
+                    it = db.iter_select('test', where=where, chunk_size=10)
+                    iters.append(it)
+                    async for rows in it:
+                        break
+            self.assertEqual(db.sync._connections, [])
+            del iters
+            gc.collect()
+
+        try:
+            self.run_async(main())
+        finally:
+            shutil.rmtree(tmp_path)
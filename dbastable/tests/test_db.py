@@ -5,9 +5,15 @@ from dbastable import SQLColumn, SQLRow, SQLTable, SQLDatabase, Where
 import numpy as np
 from astropy.table import Table
 import tempfile
+import gc
+import shutil
 import sys
 import unittest
 import os
+import pickle
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from dbastable.tests.mixins import TestCaseWithNumpyCompare
 
@@ -37,6 +43,19 @@ class TestSQLDatabaseCreationModify(TestCaseWithNumpyCompare):
         self.assertEqual(len(db), 1)
         self.assertEqual(db.table_names, ['test'])
 
+    def test_sql_add_column_large_data(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', data=np.arange(100000))
+        db.add_column('test', 'b', data=np.arange(100000)*0.5)
+        db.add_column('test', 'c', data=[str(i) for i in range(100000)])
+
+        self.assertEqual(db.count('test'), 100000)
+        self.assertEqual(db.get_row('test', 99999).values,
+                         (99999, 49999.5, '99999'))
+        self.assertEqualArray(db.get_column('test', 'b').values,
+                              np.arange(100000)*0.5)
+
     def test_sql_add_column_only_name(self):
         db = SQLDatabase(':memory:')
         db.add_table('test')
@@ -239,6 +258,33 @@ class TestSQLDatabaseCreationModify(TestCaseWithNumpyCompare):
         with self.assertRaises(ValueError):
             db.set_column('test', 'a', [10, 20, 30, 40])
 
+    def test_sql_set_columns(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', [1, 3, 5])
+        db.add_column('test', 'b', [2, 4, 6])
+
+        db.set_columns('test', {'a': [10, 30, 50], 'c': ['x', 'y', 'z']})
+        self.assertEqual(db.column_names('test'), ['a', 'b', 'c'])
+        self.assertEqual(db.get_column('test', 'a').values, [10, 30, 50])
+        self.assertEqual(db.get_column('test', 'b').values, [2, 4, 6])
+        self.assertEqual(db.get_column('test', 'c').values, ['x', 'y', 'z'])
+
+        with self.assertRaises(ValueError):
+            db.set_columns('test', {'a': [1, 2]})
+        with self.assertRaises(ValueError):
+            db.set_columns('test', {'a': [1, 2, 3], 'b': [1, 2]})
+        with self.assertRaises(TypeError):
+            db.set_columns('test', [[1, 2, 3]])
+
+    def test_sql_set_columns_empty_table(self):
+        db = SQLDatabase(':memory:', cache_counts=True)
+        db.add_table('test', columns=['a'])
+        self.assertEqual(db.count('test'), 0)
+        db.set_columns('test', {'a': [1, 2], 'b': [3, 4]})
+        self.assertEqual(db.count('test'), 2)
+        self.assertEqual(db.select('test'), [(1, 3), (2, 4)])
+
     def test_sql_set_row(self):
         db = SQLDatabase(':memory:')
         db.add_table('test')
@@ -268,6 +314,80 @@ class TestSQLDatabaseCreationModify(TestCaseWithNumpyCompare):
         self.assertEqual(db.get_column('test', 'a').values, [10, 3, 5])
         self.assertEqual(db.get_column('test', 'b').values, [2, 'a', 6])
 
+    def test_sql_set_rows(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', [1, 3, 5, 7])
+        db.add_column('test', 'b', [2, 4, 6, 8])
+
+        db.set_rows('test', [0, -1], [(10, 20), (70, 80)])
+        self.assertEqual(db.get_column('test', 'a').values, [10, 3, 5, 70])
+        self.assertEqual(db.get_column('test', 'b').values, [20, 4, 6, 80])
+
+        # dict only changes the given columns
+        db.set_rows('test', [1, 2], {'a': [30, 50]})
+        self.assertEqual(db.get_column('test', 'a').values, [10, 30, 50, 70])
+        self.assertEqual(db.get_column('test', 'b').values, [20, 4, 6, 80])
+
+        data = np.array([(-1, -2), (-3, -4)], dtype=[('a', 'i4'),
+                                                      ('b', 'i4')])
+        db.set_rows('test', np.array([2, 0]), data)
+        self.assertEqual(db.get_column('test', 'a').values, [-3, 30, -1, 70])
+        self.assertEqual(db.get_column('test', 'b').values, [-4, 4, -2, 80])
+
+        with self.assertRaises(IndexError):
+            db.set_rows('test', [0, 4], {'a': [1, 2]})
+        with self.assertRaises(ValueError):
+            db.set_rows('test', [0, 1], [(1, 2)])
+        with self.assertRaises(ValueError):
+            db.set_rows('test', [0], [(1, 2, 3)])
+        with self.assertRaises(KeyError):
+            db.set_rows('test', [0], {'c': [1]})
+        with self.assertRaises(TypeError):
+            db.set_rows('test', [0], 1)
+
+    def test_sql_set_items(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', [1, 3, 5])
+        db.add_column('test', 'b', [2, 4, 6])
+
+        db.set_items('test', 'a', [0, 2], [10, 50])
+        db.set_items('test', 'b', np.array([-1, 0]), 'x')
+        self.assertEqual(db.get_column('test', 'a').values, [10, 3, 50])
+        self.assertEqual(db.get_column('test', 'b').values, ['x', 4, 'x'])
+
+        with self.assertRaises(IndexError):
+            db.set_items('test', 'a', [3], 1)
+        with self.assertRaises(ValueError):
+            db.set_items('test', 'a', [0, 1], [1, 2, 3])
+        with self.assertRaises(KeyError):
+            db.set_items('test', 'c', [0], 1)
+
+    def test_sql_update(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', data=np.arange(10, 20))
+        db.add_column('test', 'b', data=np.arange(20, 30))
+
+        n = db.update('test', {'b': -1}, where=Where('a', '>=', 17))
+        self.assertEqual(n, 3)
+        self.assertEqual(db.get_column('test', 'b').values,
+                         list(range(20, 27)) + [-1]*3)
+
+        n = db.update('test', values={'a': 0, 'b': 0}, where={'a': 12})
+        self.assertEqual(n, 1)
+        self.assertEqual(db.get_row('test', 2).values, (0, 0))
+
+        self.assertEqual(db.update('test', {'a': 1}, where={'a': 100}), 0)
+        self.assertEqual(db.update('test', {'a': 1}), 10)
+        self.assertEqual(db.get_column('test', 'a').values, [1]*10)
+
+        with self.assertRaises(KeyError):
+            db.update('test', {'c': 1})
+        with self.assertRaises(TypeError):
+            db.update('test', [('a', 1)])
+
     def test_sql_setitem_tuple_only(self):
         db = SQLDatabase(':memory:')
         db.add_table('test')
@@ -339,6 +459,65 @@ class TestSQLDatabaseCreationModify(TestCaseWithNumpyCompare):
         self.assertEqualArray(db2.get_column('test', 'b').values,
                               arr_b[indx])
 
+    def test_sql_copy_indexes_multiple_tables(self):
+        db = SQLDatabase(':memory:', allow_b32_colnames=True,
+                         autocommit=False)
+        db.add_table('test')
+        db.add_column('test', 'a-b', [1, 3, 5, 7])
+        db.add_table('other', columns=['c'])
+        db.add_rows('other', {'c': [10, 20]})
+        db.add_table('empty')
+
+        db2 = db.copy(indexes={'test': [-1, 0, 0]})
+        self.assertFalse(db._con.in_transaction)
+        self.assertEqual(db.table_names, ['test', 'other', 'empty'])
+        self.assertEqual(db2.table_names, ['test', 'other', 'empty'])
+        self.assertEqual(db2.column_names('test'), ['a-b'])
+        self.assertEqual(db2.select('test'), [(7,), (1,), (1,)])
+        self.assertEqual(db2.select('other'), [(10,), (20,)])
+        self.assertEqual(db2.count('empty'), 0)
+        # indexes are dense in the copy
+        db2.add_rows('test', {'a-b': 9})
+        self.assertEqual(db2.execute('SELECT __id__ FROM test;'),
+                         [(1,), (2,), (3,), (4,)])
+
+        db3 = db.copy(indexes={'test': []})
+        self.assertEqual(db3.count('test'), 0)
+        self.assertEqual(db3.count('other'), 2)
+
+        with self.assertRaises(IndexError):
+            db.copy(indexes={'test': [0, 4]})
+        # temporary tables are dropped
+        self.assertEqual(db.execute('SELECT name FROM temp.sqlite_master;'),
+                         [])
+
+    def test_sql_copy_indexes_large(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.set_columns('test', {'a': np.arange(100000)})
+        # more indexes than the SQLite variables limit
+        indx = np.random.default_rng(0).permutation(100000)[:50000]
+        db2 = db.copy(indexes={'test': indx})
+        self.assertEqualArray(db2['test']['a'].values, indx)
+
+    @unittest.skipIf(sys.version_info < (3, 11), "requires serialize")
+    def test_sql_to_from_bytes(self):
+        db = SQLDatabase(':memory:', allow_b32_colnames=True)
+        db.add_table('test')
+        db.set_columns('test', {'a-b': [1, 3, 5], 'c': ['x', 'y', 'z']})
+
+        data = db.to_bytes()
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(data[:16], b'SQLite format 3\x00')
+
+        db2 = SQLDatabase.from_bytes(data, allow_b32_colnames=True)
+        self.assertEqual(db2.column_names('test'), ['a-b', 'c'])
+        self.assertEqual(db2.select('test'), db.select('test'))
+        # the new database is independent and writable
+        db2.add_rows('test', {'a-b': 7, 'c': 'w'})
+        self.assertEqual(db2.count('test'), 4)
+        self.assertEqual(db.count('test'), 3)
+
     def test_sql_delete_row(self):
         db = SQLDatabase(':memory:')
         db.add_table('test')
@@ -354,6 +533,18 @@ class TestSQLDatabaseCreationModify(TestCaseWithNumpyCompare):
         with self.assertRaises(IndexError):
             db.delete_row('test', -4)
 
+    def test_sql_delete_row_add_row(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', [1, 3, 5])
+
+        db.delete_row('test', 0)
+        db.add_rows('test', {'a': [7]})
+        self.assertEqual(db.get_column('test', 'a').values, [3, 5, 7])
+        self.assertEqual(db.get_row('test', 2).values, (7,))
+        db.set_column('test', 'a', [0, 1, 2])
+        self.assertEqual(db.get_column('test', 'a').values, [0, 1, 2])
+
     def test_sql_delete_column(self):
         db = SQLDatabase(':memory:')
         db.add_table('test')
@@ -533,6 +724,37 @@ class TestSQLDatabasePropsComms(TestCaseWithNumpyCompare):
                              Where('b', '<', 26)])
         self.assertEqualArray(a, [(13, 23), (14, 24), (15, 25)])
 
+    def test_sql_template_cache(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', data=np.arange(10, 20))
+
+        comm1, args1 = db._select_command('test', where={'a': 15}, limit=1)
+        comm2, args2 = db._select_command('test', where={'a': 12}, limit=3)
+        # same query shape reuses the same command
+        self.assertIs(comm1, comm2)
+        self.assertEqual(args1, [15, 1])
+        self.assertEqual(args2, [12, 3])
+        self.assertEqual(db.select('test', where={'a': Where('a', 'IN',
+                                                             [11, 13])}),
+                         [(11,), (13,)])
+        self.assertEqual(db.select('test', where={'a': Where('a', 'IN',
+                                                             [11, 13, 19])}),
+                         [(11,), (13,), (19,)])
+        self.assertEqual(db.count('test', where={'a': 15}), 1)
+        self.assertEqual(db.count('test', where={'a': 30}), 0)
+
+        # the cache is cleared when the schema changes
+        db.add_column('test', 'b', data=np.arange(10))
+        comm3, _ = db._select_command('test', where={'a': 15}, limit=1)
+        self.assertIsNot(comm1, comm3)
+        self.assertEqual(db.select('test', where={'a': 15}), [(15, 5)])
+
+        db.delete_column('test', 'b')
+        self.assertEqual(db.select('test', where={'a': 15}), [(15,)])
+        with self.assertRaises(KeyError):
+            db.select('test', columns='b')
+
     def test_sql_select_limit_offset(self):
         db = SQLDatabase(':memory:')
         db.add_table('test')
@@ -598,6 +820,20 @@ class TestSQLDatabasePropsComms(TestCaseWithNumpyCompare):
                       limit=3, offset=2)
         self.assertEqualArray(a, [(12, 27), (11, 28), (10, 29)])
 
+    def test_sql_iter_select(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', data=np.arange(10, 20))
+        db.add_column('test', 'b', data=np.arange(20, 30))
+
+        chunks = list(db.iter_select('test', chunk_size=4))
+        self.assertEqual([len(c) for c in chunks], [4, 4, 2])
+        self.assertEqual(sum(chunks, []), db.select('test'))
+
+        chunks = list(db['test'].iter_select(columns='a', chunk_size=3,
+                                             where=Where('a', '>', 15)))
+        self.assertEqual(chunks, [[(16,), (17,), (18,)], [(19,)]])
+
     def test_sql_count(self):
         db = SQLDatabase(':memory:')
         db.add_table('test')
@@ -674,3 +910,682 @@ class TestSQLDatabasePropsComms(TestCaseWithNumpyCompare):
         self.assertEqual(db.index_of('test', Where('b', '>=', 27)),
                          [7, 8, 9])
         self.assertEqual(db.index_of('test', {'a': 1, 'b': 2}), [])
+
+    def test_sql_index_of_many(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', data=[10, 11, 12, 11, 14])
+        db.add_column('test', 'b', data=['x', 'y', 'z', 'w', 'v'])
+
+        indx = db.index_of_many('test', 'a', np.array([14, 10, 50, 12]))
+        self.assertIsInstance(indx, np.ndarray)
+        self.assertEqualArray(indx, [4, 0, -1, 2])
+        self.assertEqualArray(db.index_of_many('test', 'B', ['v', 'x', 'v']),
+                              [4, 0, 4])
+        self.assertEqualArray(db.index_of_many('test', 'a', []), [])
+
+        # duplicated rows
+        self.assertEqualArray(db.index_of_many('test', 'a', [11, 10]),
+                              [1, 0])
+        self.assertEqualArray(db.index_of_many('test', 'a', [11, 10],
+                                               duplicates='last'), [3, 0])
+        with self.assertRaisesRegex(ValueError, 'more than one row'):
+            db.index_of_many('test', 'a', [10, 11], duplicates='error')
+        self.assertEqualArray(db.index_of_many('test', 'a', [10, 12],
+                                               duplicates='error'), [0, 2])
+
+        with self.assertRaises(ValueError):
+            db.index_of_many('test', 'a', [10], duplicates='any')
+        with self.assertRaises(KeyError):
+            db.index_of_many('test', 'c', [10])
+        with self.assertRaises(KeyError):
+            db.index_of_many('not_a_table', 'a', [10])
+
+        # many keys
+        db.add_rows('test', {'a': np.arange(100, 10100)})
+        keys = np.arange(10099, 95, -1)
+        expect = np.where(keys >= 100, keys - 95, -1)
+        self.assertEqualArray(db.index_of_many('test', 'a', keys), expect)
+        self.assertEqual(db.execute("SELECT name FROM temp.sqlite_master;"),
+                         [])
+
+    def test_sql_column_types(self):
+        db = SQLDatabase(':memory:')
+        db.execute("CREATE TABLE test (__id__ INTEGER PRIMARY KEY, "
+                   "a INTEGER, b TEXT, c);")
+        self.assertEqual(db.column_names('test'), ['a', 'b', 'c'])
+        self.assertEqual(db.column_types('test'), ['INTEGER', 'TEXT', ''])
+
+        db.add_column('test', 'd')
+        self.assertEqual(db.column_types('test'), ['INTEGER', 'TEXT', '', ''])
+        db.delete_column('test', 'b')
+        self.assertEqual(db.column_names('test'), ['a', 'c', 'd'])
+        self.assertEqual(db.column_types('test'), ['INTEGER', '', ''])
+
+    @unittest.skipIf(sys.platform.startswith("win"),
+                     "problems with temp_path")
+    def test_sql_schema_other_connection(self):
+        tmp_path = tempfile.mkdtemp()
+        path = os.path.join(tmp_path, 'test.db')
+        db1 = SQLDatabase(path)
+        db2 = SQLDatabase(path)
+        db1.add_table('test', columns=['a'])
+        self.assertEqual(db2.table_names, ['test'])
+        self.assertEqual(db2.column_names('test'), ['a'])
+
+        db2.add_column('test', 'b')
+        db2.add_table('test2')
+        self.assertEqual(db1.column_names('test'), ['a', 'b'])
+        self.assertEqual(db1.table_names, ['test', 'test2'])
+
+        db2.drop_table('test2')
+        self.assertEqual(db1.table_names, ['test'])
+        del db1, db2
+        os.remove(path)
+        os.removedirs(tmp_path)
+
+    def test_sql_schema_checked_once(self):
+        # other connections can change the schema of shared databases
+        db = SQLDatabase('file:checked_once?mode=memory&cache=shared')
+        db.add_table('test', columns=['a', 'b'])
+        db.add_rows('test', {'a': np.arange(10), 'b': np.arange(10)})
+        commands = []
+        db._con.set_trace_callback(commands.append)
+        for func, args in [(db.select, ('test', 'a', {'b': 2})),
+                           (db.count, ('test', Where('a', '>', 2))),
+                           (db.get_item, ('test', 'a', 3)),
+                           (db.add_rows, ('test', {'a': 1, 'b': 2})),
+                           (db.update, ('test', {'a': 1}, {'b': 2}))]:
+            commands.clear()
+            func(*args)
+            self.assertEqual(commands.count('PRAGMA schema_version;'), 1)
+        self.assertFalse(db._state.schema_checked)
+
+        # a failing call also ends the check
+        with self.assertRaises(KeyError):
+            db.select('test', 'c')
+        self.assertFalse(db._state.schema_checked)
+
+    def test_sql_schema_static(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test', columns=['a', 'b'])
+        db.add_rows('test', {'a': np.arange(10), 'b': np.arange(10)})
+        db.add_column('test', 'c')
+        commands = []
+        db._con.set_trace_callback(commands.append)
+        # only this connection can change the schema of private databases
+        self.assertEqual(db.count('test'), 10)
+        self.assertEqual(db.column_names('test'), ['a', 'b', 'c'])
+        self.assertEqual(db.table_names, ['test'])
+        self.assertNotIn('PRAGMA schema_version;', commands)
+
+        # changes made by the user commands are still seen
+        db.execute('ALTER TABLE test ADD COLUMN d;')
+        self.assertEqual(db.column_names('test'), ['a', 'b', 'c', 'd'])
+        db.execute('DROP TABLE test;')
+        self.assertEqual(db.table_names, [])
+
+        # and the rolled back ones
+        db = SQLDatabase(':memory:', autocommit=False)
+        db.add_table('test', columns=['a'])
+        db.commit()
+        db.add_rows('test', {'a': 1})
+        db.add_column('test', 'b')
+        self.assertEqual(db.column_names('test'), ['a', 'b'])
+        # a failing command rolls back the transaction
+        with self.assertRaises(sqlite3.OperationalError):
+            db.execute('SELECT * FROM missing;')
+        self.assertEqual(db.column_names('test'), ['a'])
+
+    def test_sql_count_cache(self):
+        db = SQLDatabase(':memory:', cache_counts=True)
+        db.add_table('test', columns=['a'])
+        db.add_rows('test', {'a': np.arange(10)})
+        self.assertEqual(db.count('test'), 10)
+        self.assertEqual(db._count_cache, {'test': 10})
+        self.assertEqual(len(db['test']), 10)
+
+        db.add_rows('test', {'a': [10, 11]})
+        self.assertEqual(db._count_cache, {'test': 12})
+        db.delete_row('test', 0)
+        self.assertEqual(db._count_cache, {'test': 11})
+        self.assertEqual(db.count('test'), 11)
+        self.assertEqual(db.count('test', where=Where('a', '>', 5)), 6)
+
+        db.drop_table('test')
+        self.assertEqual(db._count_cache, {})
+
+    @unittest.skipIf(sys.platform.startswith("win"),
+                     "problems with temp_path")
+    def test_sql_count_cache_other_connection(self):
+        tmp_path = tempfile.mkdtemp()
+        path = os.path.join(tmp_path, 'test.db')
+        db1 = SQLDatabase(path, cache_counts=True)
+        db2 = SQLDatabase(path)
+        db1.add_table('test', columns=['a'])
+        db1.add_rows('test', {'a': np.arange(10)})
+        self.assertEqual(db1.count('test'), 10)
+
+        db2.add_rows('test', {'a': [10, 11]})
+        self.assertEqual(db1.count('test'), 12)
+        db2.delete_row('test', 0)
+        self.assertEqual(len(db1['test']), 11)
+        del db1, db2
+        os.remove(path)
+        os.removedirs(tmp_path)
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestSQLDatabaseThreadSafe(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_thread_safe_readers(self):
+        db = SQLDatabase(self.path, thread_safe=True)
+        self.assertEqual(db.execute('PRAGMA journal_mode;'), [('wal',)])
+        db.add_table('test')
+        db.add_column('test', 'a', data=np.arange(100))
+
+        def read(i):
+            return (db.count('test', where=Where('a', '>=', i)),
+                    db['test']['a'][i],
+                    id(db._con))
+
+        with ThreadPoolExecutor(4) as pool:
+            res = list(pool.map(read, range(100)))
+        self.assertEqual([r[0] for r in res], list(range(100, 0, -1)))
+        self.assertEqual([r[1] for r in res], list(range(100)))
+        # each thread has its own connection
+        self.assertGreater(len({r[2] for r in res}), 1)
+        self.assertNotIn(id(db._con), [r[2] for r in res])
+        db.close()
+
+    def test_thread_safe_writers(self):
+        db = SQLDatabase(self.path, thread_safe=True)
+        db.add_table('test', columns=['a'])
+
+        def write(i):
+            db.add_rows('test', {'a': i})
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(write, range(50)))
+        self.assertEqual(db.count('test'), 50)
+        self.assertEqual(sorted(db['test']['a'].values), list(range(50)))
+        db.close()
+
+    def test_thread_safe_shared_schema(self):
+        db = SQLDatabase(self.path, thread_safe=True)
+        db.add_table('test', columns=['a'])
+        db.add_rows('test', {'a': np.arange(10)})
+        barrier = threading.Barrier(4)
+
+        def read(i):
+            barrier.wait()
+            return db.count('test', where={'a': i}), db.column_names('test')
+
+        with self.assertLogs(db.logger, 'DEBUG') as logs:
+            with ThreadPoolExecutor(4) as pool:
+                res = list(pool.map(read, range(4)))
+        self.assertEqual(res, [(1, ['a'])]*4)
+        # the schema is not loaded again by each thread
+        self.assertFalse(any('loading database schema' in i
+                             for i in logs.output))
+        db.close()
+
+    def test_thread_safe_uncommitted(self):
+        db = SQLDatabase(self.path, thread_safe=True, cache_counts=True,
+                         autocommit=False)
+        db.add_table('test', columns=['a'])
+        db.add_rows('test', {'a': [1, 2]})
+        db.commit()
+        self.assertEqual(db.count('test'), 2)
+
+        def read():
+            return db.count('test'), db.column_names('test')
+
+        with ThreadPoolExecutor(1) as pool:
+            self.assertEqual(pool.submit(read).result(), (2, ['a']))
+
+            # uncommitted changes are only seen by the main thread
+            db.add_rows('test', {'a': [3, 4, 5]})
+            self.assertEqual(db.count('test'), 5)
+            self.assertEqual(pool.submit(read).result(), (2, ['a']))
+            db.add_column('test', 'b')
+            self.assertEqual(db.column_names('test'), ['a', 'b'])
+            self.assertEqual(pool.submit(read).result(), (2, ['a']))
+            db.commit()
+            self.assertEqual(pool.submit(read).result(), (5, ['a', 'b']))
+
+        # a rolled back change is dropped from the cache
+        db.add_rows('test', {'a': 6})
+        db.add_column('test', 'c')
+        self.assertEqual(db.column_names('test'), ['a', 'b', 'c'])
+        db.execute('ROLLBACK;')
+        self.assertEqual(db.column_names('test'), ['a', 'b'])
+        db.close()
+
+    def test_thread_safe_released(self):
+        db = SQLDatabase(self.path, thread_safe=True)
+        db.add_table('test', columns=['a'])
+        db.add_rows('test', {'a': np.arange(10)})
+
+        for i in range(20):
+            thread = threading.Thread(target=db.count, args=('test',))
+            thread.start()
+            thread.join()
+        gc.collect()
+        # the connections of the finished threads are closed
+        self.assertEqual(db._connections, [db._con])
+        self.assertEqual(db.count('test'), 10)
+        db.close()
+
+    def test_thread_safe_memory(self):
+        with self.assertRaises(ValueError):
+            SQLDatabase(':memory:', thread_safe=True)
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestSQLDatabaseBusy(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        db = SQLDatabase(self.path)
+        db.add_table('test', columns=['a'])
+        db.close()
+        # other process holding the write lock
+        self.other = sqlite3.connect(self.path, isolation_level=None,
+                                     check_same_thread=False)
+        self.other.execute('BEGIN IMMEDIATE;')
+
+    def tearDown(self):
+        self.other.close()
+        shutil.rmtree(self.tmp_path)
+
+    def test_busy_timeout(self):
+        db = SQLDatabase(self.path, busy_timeout=0.01)
+        self.assertEqual(db.execute('PRAGMA busy_timeout;'), [(10,)])
+        with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+            db.add_rows('test', {'a': 1})
+        self.assertEqual(db.stats, {'lock_waits': 0, 'lock_errors': 1})
+        db.close()
+
+    def test_retries(self):
+        db = SQLDatabase(self.path, busy_timeout=0, retries=20,
+                         retry_backoff=0.005)
+        timer = threading.Timer(0.02, self.other.rollback)
+        timer.start()
+        db.add_rows('test', {'a': 1})
+        timer.join()
+        self.assertEqual(db.select('test'), [(1,)])
+        self.assertGreater(db.stats['lock_waits'], 0)
+        self.assertEqual(db.stats['lock_errors'], 0)
+        db.close()
+
+    def test_retries_exhausted(self):
+        db = SQLDatabase(self.path, busy_timeout=0, retries=2,
+                         retry_backoff=0.001)
+        with self.assertRaises(sqlite3.OperationalError):
+            db.add_rows('test', {'a': 1})
+        self.assertEqual(db.stats, {'lock_waits': 2, 'lock_errors': 1})
+
+        # commands inside a larger transaction are not retried
+        db.autocommit = False
+        with self.assertRaises(sqlite3.OperationalError):
+            db.add_rows('test', {'a': 1})
+        self.assertEqual(db.stats, {'lock_waits': 2, 'lock_errors': 2})
+        db.close()
+
+        with self.assertRaises(ValueError):
+            SQLDatabase(self.path, retries=-1)
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestSQLDatabaseCopyFile(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        self.db = SQLDatabase(self.path)
+        self.db.add_table('test')
+        self.db.set_columns('test', {'a': np.arange(1000),
+                                     'b': ['x']*1000})
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp_path)
+
+    def test_copy_backup(self):
+        calls = []
+
+        def progress(status, remaining, total):
+            calls.append((remaining, total))
+
+        db = self.db.copy(progress=progress, pages=1)
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(calls[-1][0], 0)
+        self.assertEqual(db.select('test'), self.db.select('test'))
+
+        dest = os.path.join(self.tmp_path, 'copy.db')
+        db = self.db.copy(destination=dest)
+        self.assertEqual(db.db, dest)
+        db.add_rows('test', {'a': -1})
+        self.assertEqual(db.count('test'), 1001)
+        self.assertEqual(self.db.count('test'), 1000)
+        db.close()
+        self.assertEqual(SQLDatabase(dest).count('test'), 1001)
+
+        with self.assertRaises(ValueError):
+            self.db.copy(destination=dest)
+
+    def test_copy_filtered_file(self):
+        dest = os.path.join(self.tmp_path, 'copy.db')
+        db = self.db.copy(indexes={'test': [5, 2]}, destination=dest)
+        self.assertEqual(db.select('test'), [(5, 'x'), (2, 'x')])
+        db.close()
+        self.assertEqual(SQLDatabase(dest).select('test'),
+                         [(5, 'x'), (2, 'x')])
+        # the destination is detached
+        self.assertNotIn('__dbastable_copy__',
+                         [i[1] for i in
+                          self.db.execute('PRAGMA database_list;')])
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestSQLDatabaseCacheInMemory(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        db = SQLDatabase(self.path)
+        db.add_table('test')
+        db.set_columns('test', {'a': np.arange(10)})
+        db.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def read_file(self):
+        con = sqlite3.connect(self.path)
+        try:
+            return [i[0] for i in con.execute('SELECT a FROM test;')]
+        finally:
+            con.close()
+
+    def test_cache_in_memory_commit(self):
+        db = SQLDatabase(self.path, cache_in_memory='commit')
+        self.assertEqual(db.execute('PRAGMA database_list;')[0][2], '')
+        self.assertEqualArray(db['test']['a'].values, np.arange(10))
+
+        db.add_rows('test', {'a': 10})
+        self.assertEqual(self.read_file(), list(range(11)))
+
+        db.autocommit = False
+        db.add_column('test', 'b')
+        db['test']['a'][0] = -1
+        self.assertEqual(self.read_file(), list(range(11)))
+        db.commit()
+        self.assertEqual(self.read_file(), [-1] + list(range(1, 11)))
+        self.assertEqual(SQLDatabase(self.path).column_names('test'),
+                         ['a', 'b'])
+        db.close()
+
+    def test_cache_in_memory_close(self):
+        db = SQLDatabase(self.path, cache_in_memory=True)
+        self.assertEqual(db._cache_in_memory, 'close')
+        db.add_rows('test', {'a': 10})
+        db.commit()
+        self.assertEqual(self.read_file(), list(range(10)))
+        db.flush()
+        self.assertEqual(self.read_file(), list(range(11)))
+
+        db.add_rows('test', {'a': 11})
+        db.autocommit = False
+        db.add_rows('test', {'a': 12})
+        db.close()
+        # uncommitted changes are discarded
+        self.assertEqual(self.read_file(), list(range(12)))
+        db.close()
+
+    def test_cache_in_memory_reads_not_flushed(self):
+        db = SQLDatabase(self.path, cache_in_memory='commit')
+        where = Where('a', 'in', list(range(2000)))
+        with self.assertLogs(db.logger, 'DEBUG') as logs:
+            self.assertEqual(len(db.select('test', where=where)), 10)
+            self.assertEqualArray(db.index_of_many('test', 'a', [3, 20]),
+                                  [3, -1])
+            copy = db.copy(indexes={'test': [1, 0]})
+        self.assertEqual(copy.select('test'), [(1,), (0,)])
+        # temporary and attached databases are not written back
+        self.assertFalse(any('working copy' in i for i in logs.output))
+
+        with self.assertLogs(db.logger, 'DEBUG') as logs:
+            db.update('test', {'a': -1}, where=where)
+        self.assertEqual(sum('working copy' in i for i in logs.output), 1)
+        self.assertEqual(self.read_file(), [-1]*10)
+        db.close()
+
+    def test_cache_in_memory_invalid(self):
+        with self.assertRaises(ValueError):
+            SQLDatabase(':memory:', cache_in_memory=True)
+        with self.assertRaises(ValueError):
+            SQLDatabase(self.path, cache_in_memory=True, thread_safe=True)
+        with self.assertRaises(ValueError):
+            SQLDatabase(self.path, cache_in_memory='always')
+
+        db = SQLDatabase(self.path, cache_in_memory=True)
+        with self.assertRaises(ValueError):
+            db.writer()
+        with self.assertRaises(ValueError):
+            with db.snapshot():
+                pass
+        db.close()
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestSQLDatabaseSnapshot(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        self.db = SQLDatabase(self.path, cache_counts=True)
+        self.db.add_table('test', columns=['a'])
+        self.db.add_rows('test', {'a': [1, 2, 3]})
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp_path)
+
+    def test_snapshot(self):
+        other = SQLDatabase(self.path, busy_timeout=0)
+        with self.db.snapshot() as db:
+            self.assertIs(db, self.db)
+            self.assertEqual(self.db.execute('PRAGMA journal_mode;'),
+                             [('wal',)])
+            self.assertEqualArray(self.db['test']['a'].values, [1, 2, 3])
+            # writers are not blocked by the snapshot
+            other.add_rows('test', {'a': 4})
+            other.set_item('test', 'a', 0, 10)
+            self.assertEqual(other.count('test'), 4)
+            self.assertEqual(self.db.count('test'), 3)
+            self.assertEqualArray(self.db['test']['a'].values, [1, 2, 3])
+            with self.db.snapshot():
+                self.assertEqual(self.db.select('test'), [(1,), (2,), (3,)])
+        self.assertFalse(self.db._con.in_transaction)
+        self.assertEqual(self.db.count('test'), 4)
+        self.assertEqualArray(self.db['test']['a'].values, [10, 2, 3, 4])
+        other.close()
+
+    def test_snapshot_error(self):
+        with self.assertRaises(KeyError):
+            with self.db.snapshot():
+                self.db.add_rows('test', {'a': 4})
+                self.db['test']['b']
+        self.assertFalse(self.db._con.in_transaction)
+        self.assertEqual(self.db.count('test'), 3)
+
+        db = SQLDatabase(self.path, autocommit=False)
+        db.add_rows('test', {'a': 4})
+        with self.assertRaisesRegex(ValueError, 'uncommitted'):
+            with db.snapshot():
+                pass
+        db.close()
+
+        with self.assertRaises(ValueError):
+            with SQLDatabase().snapshot():
+                pass
+
+
+class TestSQLDatabaseSharedMemory(TestCaseWithNumpyCompare):
+    uri = 'file:dbastable_test?mode=memory&cache=shared'
+
+    def test_shared_memory(self):
+        db = SQLDatabase(self.uri)
+        self.assertTrue(db._is_memory)
+        db.add_table('test')
+        db.set_columns('test', {'a': np.arange(100)})
+
+        other = SQLDatabase(self.uri)
+        self.assertEqual(other.table_names, ['test'])
+        other.add_rows('test', {'a': 100})
+        self.assertEqual(db.count('test'), 101)
+        other.close()
+
+        # private memory databases are not shared
+        self.assertEqual(SQLDatabase(':memory:').table_names, [])
+        self.assertEqual(SQLDatabase('file::memory:').table_names, [])
+        db.close()
+        # the database is removed with the last connection
+        self.assertEqual(SQLDatabase(self.uri).table_names, [])
+
+    def test_shared_memory_threads(self):
+        db = SQLDatabase(self.uri, thread_safe=True)
+        db.add_table('test')
+        db.set_columns('test', {'a': np.arange(100)})
+
+        def read(i):
+            return db['test']['a'][i], id(db._con)
+
+        with ThreadPoolExecutor(4) as pool:
+            res = list(pool.map(read, range(100)))
+        self.assertEqual([r[0] for r in res], list(range(100)))
+        self.assertGreater(len({r[1] for r in res}), 1)
+
+        with db.writer() as writer:
+            for i in range(10):
+                writer.add_rows('test', {'a': 100+i})
+        self.assertEqual(db.count('test'), 110)
+        db.close()
+
+    def test_shared_memory_invalid(self):
+        with self.assertRaises(ValueError):
+            SQLDatabase('file::memory:', thread_safe=True)
+        db = SQLDatabase(self.uri)
+        db.add_table('test', columns=['a'])
+        with self.assertRaises(ValueError):
+            db.parallel_map('test', len)
+        with self.assertRaises(ValueError):
+            SQLDatabase(self.uri, cache_in_memory=True)
+        db.close()
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestSQLDatabaseReadOnly(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        db = SQLDatabase(self.path)
+        db.add_table('test')
+        db.set_columns('test', {'a': np.arange(10), 'b': np.arange(10)*2})
+        db.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_readonly(self):
+        db = SQLDatabase(self.path, readonly=True)
+        self.assertEqual(db.execute('PRAGMA mmap_size;'), [(2**28,)])
+        self.assertEqual(db.table_names, ['test'])
+        self.assertEqualArray(db['test']['b'].values, np.arange(10)*2)
+        self.assertEqual(db.count('test', where={'a': 2}), 1)
+        db.commit()
+
+        for func, args in [(db.add_table, ('new',)),
+                           (db.drop_table, ('test',)),
+                           (db.add_column, ('test', 'c')),
+                           (db.delete_column, ('test', 'a')),
+                           (db.set_column, ('test', 'a', [0]*10)),
+                           (db.add_rows, ('test', {'a': 1})),
+                           (db.delete_row, ('test', 0)),
+                           (db.set_row, ('test', 0, [1, 2])),
+                           (db.set_item, ('test', 'a', 0, 1)),
+                           (db.update, ('test', {'a': 1})),
+                           (db.appender, ('test',)),
+                           (db.writer, ())]:
+            with self.assertRaises(PermissionError):
+                func(*args)
+        with self.assertRaises(PermissionError):
+            db['test']['a'][0] = 1
+        with self.assertRaises(sqlite3.OperationalError):
+            db.execute('DELETE FROM test;')
+        self.assertEqual(db.count('test'), 10)
+
+        copy = db.copy(indexes={'test': [1, 0]})
+        self.assertEqual(copy.select('test'), [(1, 2), (0, 0)])
+        with db.snapshot():
+            self.assertEqual(db.count('test'), 10)
+        self.assertFalse(db._con.in_transaction)
+        db.close()
+
+    def test_readonly_large_in(self):
+        db = SQLDatabase(self.path, readonly=True)
+        keys = list(range(2000))
+        self.assertEqual(len(db.select('test', where=Where('a', 'IN',
+                                                           keys))), 10)
+        self.assertFalse(db._con.in_transaction)
+        self.assertEqual(len(list(db.iter_select('test', where=Where(
+            'a', 'NOT IN', keys)))), 0)
+        self.assertFalse(db._con.in_transaction)
+        with db.snapshot():
+            self.assertEqual(db.count('test', where=Where('a', 'IN', keys)),
+                             10)
+            self.assertTrue(db._con.in_transaction)
+        self.assertFalse(db._con.in_transaction)
+
+        # the reader does not block the writers
+        writer = SQLDatabase(self.path, busy_timeout=0)
+        writer.add_rows('test', {'a': 10, 'b': 20})
+        self.assertEqual(db.count('test'), 11)
+        writer.close()
+        db.close()
+
+    def test_readonly_index_of_many(self):
+        db = SQLDatabase(self.path, readonly=True)
+        self.assertEqualArray(db.index_of_many('test', 'a', [3, 20, 0]),
+                              [3, -1, 0])
+        self.assertFalse(db._con.in_transaction)
+
+        writer = SQLDatabase(self.path, busy_timeout=0)
+        writer.add_rows('test', {'a': 20, 'b': 40})
+        self.assertEqualArray(db.index_of_many('test', 'a', [3, 20, 0]),
+                              [3, 10, 0])
+        writer.close()
+        db.close()
+
+    def test_immutable(self):
+        db = SQLDatabase(self.path, immutable=True, mmap_size=0)
+        self.assertTrue(db._readonly)
+        self.assertEqual(db.execute('PRAGMA mmap_size;'), [(0,)])
+        self.assertEqual(db.select('test', columns='a', limit=2), [(0,), (1,)])
+        with self.assertRaises(PermissionError):
+            db.add_rows('test', {'a': 1})
+
+        db2 = pickle.loads(pickle.dumps(db))
+        self.assertTrue(db2._immutable)
+        self.assertEqual(db2.count('test'), 10)
+        db.close()
+        db2.close()
+
+    def test_readonly_memory(self):
+        with self.assertRaises(ValueError):
+            SQLDatabase(':memory:', readonly=True)
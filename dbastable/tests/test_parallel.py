@@ -0,0 +1,218 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# flake8: noqa: F403, F405
+
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dbastable import SQLDatabase, SQLTable, SQLColumn, SQLRow
+from dbastable._sqldb import _after_fork_in_child
+
+from dbastable.tests.mixins import TestCaseWithNumpyCompare
+
+
+def _row_sum(row):
+    return sum(row)
+
+
+def _first(row):
+    return row[0]
+
+
+def _read_source(n):
+    if n == 0:
+        return None
+    if n == 3:
+        return {'a': [n], 'c': [n*100]}
+    return {'a': list(range(n)), 'b': [n]*n}
+
+
+def _column_sum(column):
+    return int(np.sum(column.values))
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestParallelMap(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        self.db = SQLDatabase(self.path)
+        self.db.add_table('test')
+        self.db.set_columns('test', {'a': np.arange(1000),
+                                     'b': np.arange(1000, 2000)})
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp_path)
+
+    def test_parallel_map(self):
+        res = self.db.parallel_map('test', _row_sum, n_workers=2)
+        self.assertEqualArray(res, np.arange(1000) + np.arange(1000, 2000))
+
+        res = self.db['test'].parallel_map(_first, columns=['b'],
+                                           n_workers=3, chunk_size=7)
+        self.assertEqualArray(res, np.arange(1000, 2000))
+
+    def test_parallel_map_uncommitted(self):
+        db = SQLDatabase(self.path, autocommit=False)
+        db.add_rows('test', {'a': -1, 'b': -1})
+        res = db.parallel_map('test', _first, columns='a', n_workers=2)
+        self.assertEqual(len(res), 1001)
+        self.assertEqual(res[-1], -1)
+        db.close()
+
+    def test_parallel_map_uri(self):
+        db = SQLDatabase('file:' + self.path + '?mode=rw')
+        res = db.parallel_map('test', _first, columns='b', n_workers=2)
+        self.assertEqualArray(res, np.arange(1000, 2000))
+        db.close()
+
+        db = SQLDatabase('file://' + self.path.replace(' ', '%20'),
+                         readonly=True)
+        res = db.parallel_map('test', _first, n_workers=2)
+        self.assertEqualArray(res, np.arange(1000))
+        db.close()
+
+    def test_parallel_map_empty(self):
+        self.db.add_table('empty', columns=['a'])
+        self.assertEqual(self.db.parallel_map('empty', _first), [])
+
+    def test_parallel_map_memory(self):
+        db = SQLDatabase()
+        db.add_table('test', columns=['a'])
+        with self.assertRaises(ValueError):
+            db.parallel_map('test', _first)
+
+    def test_ingest(self):
+        n = self.db.ingest('new', [1, 2, 0, 4, 5], _read_source,
+                           add_columns=True, n_workers=2)
+        self.assertEqual(n, 12)
+        self.assertEqual(self.db.column_names('new'), ['a', 'b'])
+        self.assertEqualArray(self.db['new']['a'].values,
+                              [0, 0, 1, 0, 1, 2, 3, 0, 1, 2, 3, 4])
+        self.assertEqualArray(self.db['new']['b'].values,
+                              [1, 2, 2, 4, 4, 4, 4, 5, 5, 5, 5, 5])
+        # no shard is left behind
+        self.assertEqual(os.listdir(self.tmp_path), ['test.db'])
+
+    def test_ingest_uri(self):
+        db = SQLDatabase('file:' + self.path)
+        n = db.ingest('new', [1, 2, 4], _read_source, add_columns=True,
+                      n_workers=2)
+        self.assertEqual(n, 7)
+        self.assertEqual(db.select('new', columns='a'),
+                         [(0,), (0,), (1,), (0,), (1,), (2,), (3,)])
+        db.close()
+        self.assertEqual(os.listdir(self.tmp_path), ['test.db'])
+
+    def test_ingest_dense_ids(self):
+        self.db.delete_row('test', 0)
+        n = self.db['test'].ingest([2, 3, 1], _read_source,
+                                   add_columns=True, n_workers=3)
+        self.assertEqual(n, 4)
+        self.assertEqual(self.db.count('test'), 1003)
+        self.assertEqual(self.db.column_names('test'), ['a', 'b', 'c'])
+        self.assertEqual(self.db.select('test', limit=4, offset=999),
+                         [(0, 2, None), (1, 2, None), (3, None, 300),
+                          (0, 1, None)])
+        ids = self.db.execute('SELECT __id__ FROM test;')
+        self.assertEqualArray([i[0] for i in ids], np.arange(1, 1004))
+        self.db.add_rows('test', {'a': -1})
+        self.assertEqual(self.db.get_row('test', 1003).values[0], -1)
+
+    def test_ingest_invalid(self):
+        with self.assertRaises(KeyError):
+            self.db.ingest('test', [3], _read_source)
+        self.assertEqual(self.db.count('test'), 1000)
+        self.assertEqual(self.db.ingest('test', [], _read_source), 0)
+
+        db = SQLDatabase()
+        with self.assertRaises(ValueError):
+            db.ingest('test', [1], _read_source)
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestPickle(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        self.db = SQLDatabase(self.path, allow_b32_colnames=True,
+                              cache_counts=True)
+        self.db.add_table('test')
+        self.db.set_columns('test', {'a': np.arange(10),
+                                     'b': np.arange(10, 20)})
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp_path)
+
+    def test_pickle_database(self):
+        db = pickle.loads(pickle.dumps(self.db))
+        self.assertIsInstance(db, SQLDatabase)
+        self.assertEqual(db.db, self.path)
+        self.assertTrue(db._allow_b32_colnames)
+        self.assertTrue(db._cache_counts)
+        self.assertEqual(db.logger, self.db.logger)
+        # the connection is opened only when used
+        self.assertEqual(db._connections, [])
+        self.assertEqual(db.select('test'), self.db.select('test'))
+        db.add_rows('test', {'a': 10, 'b': 20})
+        self.assertEqual(self.db.count('test'), 11)
+        db.close()
+
+    def test_pickle_viewers(self):
+        table = pickle.loads(pickle.dumps(self.db['test']))
+        self.assertIsInstance(table, SQLTable)
+        self.assertEqual(table.name, 'test')
+        self.assertEqualArray(table['a'].values, np.arange(10))
+
+        column = pickle.loads(pickle.dumps(self.db['test']['b']))
+        self.assertIsInstance(column, SQLColumn)
+        self.assertEqualArray(column.values, np.arange(10, 20))
+
+        row = pickle.loads(pickle.dumps(self.db['test'][3]))
+        self.assertIsInstance(row, SQLRow)
+        self.assertEqual(row.values, (3, 13))
+
+    @unittest.skipIf(sys.version_info < (3, 11), "requires serialize")
+    def test_pickle_memory(self):
+        db = self.db.copy()
+        table = pickle.loads(pickle.dumps(db['test']))
+        self.assertIsNot(table._db, db)
+        self.assertEqualArray(table['b'].values, np.arange(10, 20))
+        table.add_rows({'a': 10, 'b': 20})
+        self.assertEqual(db.count('test'), 10)
+        self.assertEqual(table._db.count('test'), 11)
+
+    def test_process_pool_viewers(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            res = list(executor.map(_column_sum, [self.db['test']['a'],
+                                                  self.db['test']['b']]))
+        self.assertEqual(res, [45, 145])
+
+    def test_fork_detection(self):
+        con = self.db._con
+        # simulate that the database object was inherited by a child process
+        self.db._pid = -1
+        _after_fork_in_child()
+        self.assertIsNot(self.db._con, con)
+        self.assertEqual(self.db.count('test'), 10)
+        # the inherited connection was not closed
+        self.assertEqual(con.execute('SELECT 1;').fetchone(), (1,))
+        con.close()
+
+    @unittest.skipIf(not hasattr(os, 'fork'), "fork is not available")
+    def test_fork_child(self):
+        con = self.db._con
+        pid = os.fork()
+        if pid == 0:
+            # the child never uses the inherited connection
+            ok = self.db._con is not con and self.db.count('test') == 10
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+        self.assertIs(self.db._con, con)
@@ -470,6 +470,26 @@ class TestSQLTable(TestCaseWithNumpyCompare):
         with self.assertRaises(IndexError):
             table[(11,)] = np.arange(10, 20)
 
+    def test_table_set_rows_items(self):
+        db = self.db
+        table = db['test']
+        expect = np.transpose([np.arange(10, 20), np.arange(20, 30)])
+
+        table.set_rows([1, 3], [(-1, -2), (-3, -4)])
+        expect[[1, 3]] = [(-1, -2), (-3, -4)]
+        self.assertEqualArray(table.values, expect)
+
+        table.set_items('b', [0, -1], [100, 200])
+        expect[[0, -1], 1] = [100, 200]
+        self.assertEqualArray(table.values, expect)
+
+    def test_table_update(self):
+        db = self.db
+        table = db['test']
+        self.assertEqual(table.update({'a': -1}, where=Where('b', '<', 22)),
+                         2)
+        self.assertEqual(table['a'].values, [-1, -1] + list(range(12, 20)))
+
     def test_table_setitem_tuple_multiple(self):
         db = self.db
         table = db['test']
@@ -509,6 +529,8 @@ class TestSQLTable(TestCaseWithNumpyCompare):
         self.assertEqual(table.index_of({'a': 15}), 5)
         self.assertEqual(table.index_of({'a': 50}), [])
         self.assertEqual(table.index_of(Where('a', '<', 13)), [0, 1, 2])
+        self.assertEqualArray(table.index_of_many('a', [13, 50, 10]),
+                              [3, -1, 0])
 
     def test_table_delete_row(self):
         db = self.db
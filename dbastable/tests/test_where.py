@@ -1,5 +1,6 @@
 import unittest
-from dbastable.where import Where, _WhereParserMixin
+import numpy as np
+from dbastable.where import Where, WhereExpression, _WhereParserMixin
 from dbastable._sanitizer import _SanitizerMixin
 from dbastable import SQLDatabase
 
@@ -156,6 +157,32 @@ class TestWhere(unittest.TestCase):
         with self.assertRaises(ValueError):
             Where('a', 'not between', [])
 
+    def test_where_expression(self):
+        w = (Where('a', '=', 1) | Where('b', 'IN', [2, 3])) & \
+            ~Where('c', '>', 4)
+        self.assertIsInstance(w, WhereExpression)
+        self.assertEqual(w.to_sql[0], '((a = ? OR b IN (?, ?)) AND '
+                                      'NOT (c > ?))')
+        self.assertEqual(w.to_sql[1], [1, 2, 3, 4])
+
+        # chains of the same operator are flattened
+        w = Where('a', '=', 1) | Where('b', '=', 2) | Where('c', '=', 3)
+        self.assertEqual(w.op, 'OR')
+        self.assertEqual(len(w.operands), 3)
+        self.assertEqual(w.to_sql[0], '(a = ? OR b = ? OR c = ?)')
+
+    def test_where_expression_error(self):
+        with self.assertRaises(TypeError):
+            Where('a', '=', 1) & {'b': 2}
+        with self.assertRaises(TypeError):
+            WhereExpression('AND', Where('a', '=', 1), 2)
+        with self.assertRaises(ValueError):
+            WhereExpression('XOR', Where('a', '=', 1), Where('b', '=', 1))
+        with self.assertRaises(ValueError):
+            WhereExpression('OR', Where('a', '=', 1))
+        with self.assertRaises(ValueError):
+            WhereExpression('NOT', Where('a', '=', 1), Where('b', '=', 1))
+
 
 class TestParseWhere(unittest.TestCase):
     def test_parse_where_none(self):
@@ -178,6 +205,17 @@ class TestParseWhere(unittest.TestCase):
         self.assertEqual(w._parse_where('table', Where('a', '=', 1)),
                          ('a = ?', [1]))
 
+    def test_parse_where_expression(self):
+        w = _WhereParser()
+        where = [Where('A', '>', 1) | ~Where('b', '=', 2), Where('c', '=', 3)]
+        self.assertEqual(w._parse_where('table', where),
+                         ('(a > ? OR NOT (b = ?)) AND c = ?', [1, 2, 3]))
+        with self.assertRaises(KeyError):
+            w._parse_where('table', Where('a', '>', 1) | Where('d', '=', 2))
+        with self.assertRaises(TypeError):
+            w._parse_where('table', {'a': Where('a', '>', 1) |
+                                     Where('b', '=', 2)})
+
 
 class TestWhereSelect(TestCaseWithNumpyCompare):
     def test_select_where_none(self):
@@ -314,3 +352,87 @@ class TestWhereSelect(TestCaseWithNumpyCompare):
 
         sel = db.select('test', where=Where('b', 'between', [2, 4]))
         self.assertEqualArray(sel, [[2, 2], [3, 3], [4, 4]])
+
+    def test_select_where_expression(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', [1, 2, 3, 4, 5])
+        db.add_column('test', 'b', [5, 4, 3, 2, 1])
+
+        where = Where('a', '=', 1) | Where('b', '<', 3)
+        sel = db.select('test', where=where)
+        self.assertEqualArray(sel, [[1, 5], [4, 2], [5, 1]])
+        self.assertEqual(db.count('test', where=where), 3)
+        self.assertEqualArray(db.index_of('test', where), [0, 3, 4])
+
+        where = ~(Where('a', '<', 2) | Where('a', '>', 4)) & \
+            Where('b', '!=', 3)
+        sel = db.select('test', where=where)
+        self.assertEqualArray(sel, [[2, 4], [4, 2]])
+
+        self.assertEqual(db.update('test', {'b': 0},
+                                   where=Where('a', '=', 2) |
+                                   Where('a', '=', 3)), 2)
+        self.assertEqualArray(db.select('test', columns='b'),
+                              [[5], [0], [0], [2], [1]])
+
+    def test_select_where_large_in(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', np.arange(5000))
+        db.add_column('test', 'b', np.arange(5000) % 7)
+
+        keys = np.arange(0, 10000, 2)
+        where = Where('a', 'in', keys)
+        self.assertEqual(db.count('test', where=where), 2500)
+        sel = db.select('test', columns='a', where=where)
+        self.assertEqualArray(np.ravel(sel), np.arange(0, 5000, 2))
+        chunks = list(db.iter_select('test', columns='a', where=where,
+                                     chunk_size=1000))
+        self.assertEqual(len(chunks), 3)
+
+        where = Where('a', 'not in', keys) & Where('b', 'in', [0, 1]) & \
+            Where('a', 'in', keys + 1)
+        self.assertEqual(db.count('test', where=where),
+                         np.sum(np.arange(1, 5000, 2) % 7 < 2))
+
+        where = Where('a', 'in', list(range(2000)))
+        n = db.update('test', {'b': -1}, where=where)
+        self.assertEqual(n, 2000)
+        self.assertEqual(db.count('test', where={'b': -1}), 2000)
+
+        # mixed types are sanitized
+        keys = [np.int64(1), 3.0, 'a', None] + list(range(4000, 6000))
+        self.assertEqual(db.count('test', where=Where('a', 'in', keys)), 1002)
+
+        # temporary tables are dropped
+        self.assertEqual(db.execute("SELECT name FROM temp.sqlite_master;"),
+                         [])
+
+    def test_select_where_large_in_interleaved(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test')
+        db.add_column('test', 'a', np.arange(100))
+        where = Where('a', 'in', list(range(2000)))
+
+        it1 = db.iter_select('test', where=where, chunk_size=10)
+        it2 = db.iter_select('test', where=where, chunk_size=10)
+        self.assertEqual(len(next(it1)), 10)
+        self.assertEqual(len(next(it2)), 10)
+        # the table of it1 is dropped only when it2 stops reading
+        it1.close()
+        self.assertEqual(len(db._state.temp_tables), 1)
+        self.assertEqual(db.count('test', where=where), 100)
+        self.assertEqual(len(list(it2)), 9)
+        self.assertEqual(db._state.temp_tables, [])
+        self.assertEqual(db.execute("SELECT name FROM temp.sqlite_master;"),
+                         [])
+
+    def test_where_large_in_sql(self):
+        db = SQLDatabase(':memory:')
+        db.add_table('test', columns=['a'])
+        comm, args = db._parse_where('test', Where('a', 'in',
+                                                   list(range(2000))))
+        self.assertIn('SELECT value FROM', comm)
+        self.assertEqual(len(args), 1)
+        self.assertEqual(list(args[0]), list(range(2000)))
@@ -0,0 +1,100 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# flake8: noqa: F403, F405
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import numpy as np
+from dbastable import SQLDatabase, SQLWriter, Where
+
+from dbastable.tests.mixins import TestCaseWithNumpyCompare
+
+
+@unittest.skipIf(sys.platform.startswith("win"), "problems with temp_path")
+class TestSQLWriter(TestCaseWithNumpyCompare):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_path, 'test.db')
+        self.db = SQLDatabase(self.path)
+        self.db.add_table('test', columns=['a', 'b'])
+
+    def tearDown(self):
+        del self.db
+        shutil.rmtree(self.tmp_path)
+
+    def test_writer_many_producers(self):
+        def produce(writer, start):
+            for i in range(start, start+50):
+                writer.add_rows('test', {'a': i, 'b': -i})
+
+        with self.db.writer(queue_size=10, batch_size=20) as writer:
+            self.assertIsInstance(writer, SQLWriter)
+            threads = [threading.Thread(target=produce, args=(writer, i*50))
+                       for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            writer.flush()
+            self.assertEqual(writer.stats['jobs'], 200)
+            self.assertLessEqual(writer.stats['transactions'], 200)
+
+        self.assertEqual(self.db.count('test'), 200)
+        self.assertEqualArray(sorted(self.db['test']['a'].values),
+                              np.arange(200))
+
+    def test_writer_futures(self):
+        with self.db.writer() as writer:
+            f1 = writer.add_rows('test', {'a': [1, 2, 3], 'b': [4, 5, 6]})
+            f2 = writer.add_rows('test', {'c': [1]})
+            f3 = writer.update('test', {'b': 0}, where=Where('a', '>', 1))
+            f4 = writer.set_items('test', 'a', [0, 1], [10, 20])
+            f5 = writer.submit('add_column', 'test', 'c')
+
+            self.assertIsNone(f1.result())
+            with self.assertRaises(KeyError):
+                f2.result()
+            self.assertEqual(f3.result(), 2)
+            self.assertIsNone(f4.result())
+            self.assertIsNone(f5.result())
+
+        self.assertEqual(self.db.column_names('test'), ['a', 'b', 'c'])
+        self.assertEqual(self.db.select('test'), [(10, 4, None),
+                                                  (20, 0, None),
+                                                  (3, 0, None)])
+
+    def test_writer_closed(self):
+        writer = self.db.writer()
+        writer.close()
+        writer.close()
+        with self.assertRaisesRegex(ValueError, 'closed'):
+            writer.add_rows('test', {'a': 1})
+
+    def test_writer_close_racing_producers(self):
+        writer = self.db.writer(queue_size=5, batch_size=2)
+        futures = []
+
+        def produce():
+            while True:
+                try:
+                    futures.append(writer.add_rows('test', {'a': 1}))
+                except ValueError:
+                    return
+
+        threads = [threading.Thread(target=produce) for _ in range(4)]
+        for t in threads:
+            t.start()
+        writer.close()
+        for t in threads:
+            t.join()
+        # every accepted job is executed
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual(self.db.count('test'), len(futures))
+
+    def test_writer_memory(self):
+        db = SQLDatabase(':memory:')
+        with self.assertRaises(ValueError):
+            db.writer()
@@ -1,12 +1,37 @@
 """Classes to hande ``WHERE`` statements of `sqlite3`."""
+import itertools
 import numpy as np
 
 
 allowed_ops = ["=", "!=", ">", "<", ">=", "<=", "LIKE", "IN", "NOT IN", "IS",
                "IS NOT", "BETWEEN", "NOT BETWEEN"]
 
+# placeholder of the temporary tables of large IN lists in generated commands
+_IN_TABLE_MARKER = '__dbastable_in{}__'
 
-class Where:
+
+class _InValues(list):
+    """Values of a large IN list, to be loaded in a temporary table."""
+
+
+class _WhereOperatorsMixin:
+    """Combine where statements with ``&``, ``|`` and ``~``."""
+
+    def __and__(self, other):
+        if not isinstance(other, (Where, WhereExpression)):
+            return NotImplemented
+        return WhereExpression('AND', self, other)
+
+    def __or__(self, other):
+        if not isinstance(other, (Where, WhereExpression)):
+            return NotImplemented
+        return WhereExpression('OR', self, other)
+
+    def __invert__(self):
+        return WhereExpression('NOT', self)
+
+
+class Where(_WhereOperatorsMixin):
     """Where statement generator for SQL queries.
 
     Parameters
@@ -22,6 +47,11 @@ class Where:
         ``NOT IN``, the value must be a list of values. If the operator is
         ``BETWEEN`` or ``NOT BETWEEN``, the value must be a list of two values.
         For all other operators, the value must be a single value.
+
+    Notes
+    -----
+    - Where statements can be combined with ``&`` (AND), ``|`` (OR) and
+      ``~`` (NOT), generating a `WhereExpression`.
     """
 
     def __init__(self, column, op, value):
@@ -31,7 +61,12 @@ class Where:
             raise ValueError(f"Operator {op} not allowed. Supported are: "
                              f"{', '.join(allowed_ops)}.")
         self.op = op
-        value = list(np.atleast_1d(value))
+        if isinstance(value, np.ndarray):
+            value = np.atleast_1d(value).tolist()
+        elif isinstance(value, (list, tuple)):
+            value = list(value)
+        else:
+            value = list(np.atleast_1d(value))
         if self.op in ['BETWEEN', 'NOT BETWEEN']:
             if len(value) != 2:
                 raise ValueError(f'For {op} two values must be given.')
@@ -42,15 +77,20 @@ class Where:
             raise ValueError(f'For {op} just one value must be given')
         self.value = value
 
+    @staticmethod
+    def _sql_template(column, op, n_values):
+        """Generate the where statement with ``n_values`` placeholders."""
+        if op in ['BETWEEN', 'NOT BETWEEN']:
+            return f"{column} {op} ? AND ?"
+        elif op in ['IN', 'NOT IN']:
+            return f"{column} {op} ({', '.join(['?']*n_values)})"
+        return f"{column} {op} ?"
+
     @property
     def to_sql(self):
         """Generate a string for the where statement."""
-        if self.op in ['BETWEEN', 'NOT BETWEEN']:
-            return f"{self.column} {self.op} ? AND ?", self.value
-        elif self.op in ['IN', 'NOT IN']:
-            s = f"{self.column} {self.op} ({', '.join(['?']*len(self.value))})"
-            return s, self.value
-        return f"{self.column} {self.op} ?", self.value
+        s = self._sql_template(self.column, self.op, len(self.value))
+        return s, self.value
 
     def __str__(self):
         if self.op in ['BEWEEN', 'NOT BETWEEN']:
@@ -65,50 +105,168 @@ class Where:
         return s
 
 
+class WhereExpression(_WhereOperatorsMixin):
+    """Combination of where statements with logical operators.
+
+    Usually created combining `Where` objects with ``&`` (AND), ``|`` (OR)
+    and ``~`` (NOT). Each expression is enclosed in parentheses in the SQL
+    statement, so the grouping of the Python expression is kept.
+
+    Parameters
+    ----------
+    op : str
+        The logical operator. Must be ``AND``, ``OR`` or ``NOT``.
+    *operands : `Where` or `WhereExpression`
+        The combined statements. ``NOT`` accepts a single operand.
+    """
+
+    def __init__(self, op, *operands):
+        op = op.upper()
+        if op not in ['AND', 'OR', 'NOT']:
+            raise ValueError(f"Operator {op} not allowed. Supported are: "
+                             "AND, OR, NOT.")
+        for o in operands:
+            if not isinstance(o, (Where, WhereExpression)):
+                raise TypeError('operands must be Where or WhereExpression '
+                                f'instances. Not {type(o)}.')
+        if op == 'NOT' and len(operands) != 1:
+            raise ValueError('For NOT just one operand must be given.')
+        if op != 'NOT' and len(operands) < 2:
+            raise ValueError(f'For {op} at least two operands must be given.')
+
+        # flatten chains of the same operator, like a & b & c
+        flat = []
+        for o in operands:
+            if isinstance(o, WhereExpression) and o.op == op != 'NOT':
+                flat.extend(o.operands)
+            else:
+                flat.append(o)
+        self.op = op
+        self.operands = flat
+
+    @property
+    def to_sql(self):
+        """Generate a string for the where statement."""
+        sql = []
+        values = []
+        for o in self.operands:
+            s, v = o.to_sql
+            sql.append(s)
+            values.extend(v)
+        if self.op == 'NOT':
+            return f"NOT ({sql[0]})", values
+        return '(' + f' {self.op} '.join(sql) + ')', values
+
+    def __str__(self):
+        if self.op == 'NOT':
+            return f"NOT ({self.operands[0]})"
+        return '(' + f' {self.op} '.join(map(str, self.operands)) + ')'
+
+    def __repr__(self):
+        s = f"{self.__class__.__name__}"
+        s += f"(op={self.op}, operands={self.operands})"
+        return s
+
+
 class _WhereParserMixin:
     """Mixin to handle the where statement parsing in the SQLDatabase."""
 
-    def _parse_where(self, table, where):
-        # None where have None statement and None arguments
+    # IN lists with more values are compared with a temporary table
+    _in_table_threshold = 1000
+
+    def _where_shape(self, where):
+        """Split a where in its shape and the values to compare.
+
+        The shape is a hashable tuple with the column, the operator and the
+        number of values of each condition. Wheres with the same shape
+        generate the same SQL statement.
+        """
+        # None where have None shape and None values
         if where is None:
             return None, None
 
-        args = []  # arguments to replace ?
-        _where = []  # where statements with ?
-
-        def _parse_token(key, value):
-            # Parse a simgle token and return the where statement with argument
-            # check if column exists
-            col = self._get_column_name(table, key)
-            # if the where is a _BaseWhere instance, just return the sql str
-            if isinstance(value, Where):
-                # use the parsed column name
-                nw = Where(col, value.op, value.value)
-                w, a = nw.to_sql
-            # if is a value, assume it to be equal
+        if isinstance(where, (Where, WhereExpression)):
+            tokens = [(None, where)]
+        elif isinstance(where, dict):
+            tokens = list(where.items())
+        elif isinstance(where, (list, tuple)):
+            for w in where:
+                if not isinstance(w, (Where, WhereExpression)):
+                    raise TypeError('if where is a list, it must be a list '
+                                    f'of Where instances. Not {type(w)}.')
+            tokens = [(None, w) for w in where]
+        else:
+            raise TypeError(f'{type(where)} not supported for where.')
+
+        shape = []
+        values = []
+        for key, value in tokens:
+            if isinstance(value, WhereExpression):
+                if key is not None:
+                    raise TypeError('expressions can not be used as values '
+                                    'of a where dict.')
+            elif isinstance(value, Where):
+                # in dicts, the key is the column
+                if key is not None:
+                    value = Where(key, value.op, value.value)
             else:
-                value = self._sanitize_value(value)
-                w, a = Where(col, '=', value).to_sql
+                # if is a value, assume it to be equal
+                value = Where(key, '=', self._sanitize_value(value))
+            shape.append(self._expression_shape(value, values))
+        return tuple(shape), values
 
-            _where.append(w)  # append the where statement
-            args.extend(a)  # as a is returned as a list, add it
+    @classmethod
+    def _expression_shape(cls, where, values):
+        """Get the shape of a where tree, appending its values to a list.
 
+        Single statements have ``(column, op, n_values)`` shapes, while
+        expressions have ``(op, (operand shapes))`` shapes.
+        """
         if isinstance(where, Where):
-            _parse_token(where.column, where)
+            if where.op in ['IN', 'NOT IN'] and \
+               len(where.value) > cls._in_table_threshold:
+                # large lists do not use placeholders
+                values.append(_InValues(where.value))
+                return (where.column, where.op, None)
+            values.extend(where.value)
+            return (where.column, where.op, len(where.value))
+        return (where.op, tuple([cls._expression_shape(o, values)
+                                 for o in where.operands]))
 
-        elif isinstance(where, dict):
-            # no need for key sanitization. It goes into _parse_token
-            for k, v in where.items():
-                _parse_token(k, v)
+    def _shape_sql(self, table, shape, tables):
+        """Generate the statement of a single shape, with placeholders."""
+        if len(shape) == 3:
+            # column names are checked and sanitized here
+            col, op, n = shape
+            col = self._get_column_name(table, col)
+            if n is None:
+                # semi-join with the temporary table of the values
+                name = _IN_TABLE_MARKER.format(next(tables))
+                return f"{col} {op} (SELECT value FROM {name})"
+            return Where._sql_template(col, op, n)
+        op, operands = shape
+        sql = [self._shape_sql(table, o, tables) for o in operands]
+        if op == 'NOT':
+            return f"NOT ({sql[0]})"
+        return '(' + f' {op} '.join(sql) + ')'
 
-        elif isinstance(where, (list, tuple)):
-            for w in where:
-                if not isinstance(w, Where):
-                    raise TypeError('if where is a list, it must be a list '
-                                    f'of Where instances. Not {type(w)}.')
-                _parse_token(w.column, w)
+    def _where_sql(self, table, shape):
+        """Generate the where statement of a shape, with placeholders.
 
-        elif where is not None:
-            raise TypeError(f'{type(where)} not supported for where.')
+        Large IN lists are compared with temporary tables, that are named
+        with markers. See ``SQLDatabase._in_tables``.
+        """
+        tables = itertools.count()
+        return ' AND '.join([self._shape_sql(table, s, tables)
+                             for s in shape])
 
-        return ' AND '.join(_where), [self._sanitize_value(a) for a in args]
+    def _where_args(self, values):
+        """Sanitize the values of a where. Large IN lists are kept."""
+        return [v if isinstance(v, _InValues) else self._sanitize_value(v)
+                for v in values]
+
+    def _parse_where(self, table, where):
+        shape, values = self._where_shape(where)
+        if shape is None:
+            return None, None
+        return self._where_sql(table, shape), self._where_args(values)